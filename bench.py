@@ -0,0 +1,157 @@
+# bench.py — бенчмарк игрового цикла Goalie Clicker
+# Запуск: python bench.py [--frames 600] [--out bench_results.json] [--only stress_1000 ...]
+# Игра рисуется в SDL dummy-драйвер, время каждого этапа кадра меряется отдельно.
+
+import os, json, time, platform, subprocess
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import game
+
+STAGES = ("events", "spawn", "update", "draw", "flip")
+WARMUP_FRAMES = 30
+
+# ---------- Scenarios ----------
+# Сценарий: (подготовка партии, размер нагрузки для стресс-теста или None)
+def setup_start_screen(g, seed):
+    g.show_start_screen = True
+    g.show_game_over = False
+
+def setup_early_game(g, seed):
+    g.start_game(seed)
+
+def setup_max_speed(g, seed):
+    g.start_game(seed)
+    # сразу после полной рампы скорости
+    g.elapsed = game.SPEED_RAMP_TIME
+
+def setup_stress(g, seed):
+    g.start_game(seed)
+    g.lives = 10**9
+
+SCENARIOS = {
+    "start_screen": (setup_start_screen, None),
+    "early_game": (setup_early_game, None),
+    "max_speed": (setup_max_speed, None),
+    "stress_100": (setup_stress, 100),
+    "stress_1000": (setup_stress, 1000),
+    "stress_10000": (setup_stress, 10000),
+}
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+def summarize(samples):
+    """Перцентили в миллисекундах"""
+    v = sorted(samples)
+    return {
+        "mean": sum(v) / len(v) * 1000.0 if v else 0.0,
+        "p50": percentile(v, 0.50) * 1000.0,
+        "p90": percentile(v, 0.90) * 1000.0,
+        "p99": percentile(v, 0.99) * 1000.0,
+        "max": (v[-1] if v else 0.0) * 1000.0,
+    }
+
+def run_scenario(g, name, frames, seed=1):
+    setup, load = SCENARIOS[name]
+    setup(g, seed)
+    policy = game.PerfectPolicy()
+    dt = g.sim_dt
+    times = {s: [] for s in STAGES}
+    frame_times = []
+    clock = time.perf_counter
+    for n in range(WARMUP_FRAMES + frames):
+        t0 = clock()
+        pygame.event.pump()
+        t1 = clock()
+        if g.show_start_screen:
+            t2 = t3 = t1
+            g.draw_start_screen()
+            t4 = clock()
+            g.present(None)
+        else:
+            zone = policy(g, dt)
+            if zone is not None:
+                g.set_goalie_zone(zone)
+            g.update_speed(dt)
+            if load is None:
+                g.update_spawning(dt)
+            else:
+                # держим заданное число шайб в полёте
+                for _ in range(load - len(g.pucks)):
+                    g.spawn_puck()
+            t2 = clock()
+            g.update_pucks(dt)
+            g.frame += 1
+            t3 = clock()
+            rects = g.draw_frame()
+            t4 = clock()
+            g.present(rects)
+            if g.show_game_over:
+                # сценарий не должен заканчиваться: начинаем заново с тем же seed
+                setup(g, seed)
+        t5 = clock()
+        if n < WARMUP_FRAMES:
+            continue
+        for stage, a, b in zip(STAGES, (t0, t1, t2, t3, t4), (t1, t2, t3, t4, t5)):
+            times[stage].append(b - a)
+        frame_times.append(t5 - t0)
+    result = {stage: summarize(v) for stage, v in times.items()}
+    result["frame"] = summarize(frame_times)
+    result["frames"] = frames
+    result["pucks_end"] = len(g.pucks)
+    return result
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Бенчмарк игрового цикла Goalie Clicker")
+    parser.add_argument("--frames", type=int, default=600, help="кадров на сценарий (без прогрева)")
+    parser.add_argument("--only", nargs="*", choices=sorted(SCENARIOS), help="запустить только эти сценарии")
+    parser.add_argument("--out", default="bench_results.json", help="куда записать результаты (JSON)")
+    parser.add_argument("--dirty-rects", action="store_true", help="рисовать в режиме dirty rects")
+    parser.add_argument("--render-scale", type=game.render_scale_arg, default=1.0, help="внутреннее разрешение кадра")
+    parser.add_argument("--renderer", choices=game.RENDERERS, default="surface", help="вывод кадра (см. game.py --renderer)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    g = game.Game(render_scale=args.render_scale, renderer=args.renderer)
+    g.wait_for_assets()
+    g.telemetry = None  # бенчмарк не должен писать на диск
+    g.dirty_rects = args.dirty_rects
+    results = {}
+    for name in args.only or SCENARIOS:
+        results[name] = r = run_scenario(g, name, args.frames, args.seed)
+        stages = "  ".join(f"{s} {r[s]['p50']:.2f}/{r[s]['p99']:.2f}" for s in STAGES)
+        print(f"{name:<14} кадр p50 {r['frame']['p50']:.2f} мс, p99 {r['frame']['p99']:.2f} мс | {stages}")
+    pygame.quit()
+
+    report = {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "frames": args.frames,
+        "dirty_rects": args.dirty_rects,
+        "render_scale": g.render_scale,
+        "renderer": "surface" if g.gpu is None else args.renderer,  # gpu без драйвера откатывается на surface
+        "scenarios": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Результаты записаны в {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# build_pack.py — сборка пака ассетов для Goalie Clicker
+# Запуск: python build_pack.py [--config assets/level_config.json] [--out assets/scene.pack]
+# Спрайты из конфига масштабируются заранее и пишутся сырыми RGBA-пикселями,
+# игра отображает пак в память и создаёт поверхности прямо из буфера.
+
+import os, sys, json, struct
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import game
+
+ALIGN = 16
+
+def align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+def build_pack(cfg, out_path):
+    entries = {}
+    blobs = []
+    for key, path, scale in game.scene_sprites(cfg):
+        if not os.path.exists(path):
+            print(f"Пропускаю {key}: нет файла {path}")
+            continue
+        src = pygame.image.load(path)
+        img = game.scale_surface(src, scale)
+        raw = pygame.image.tobytes(img, "RGBA")
+        st = os.stat(path)
+        name = game.pack_key(path, scale)
+        entries[name] = {"key": key, "w": img.get_width(), "h": img.get_height(),
+                         "src_size": st.st_size, "src_mtime": int(st.st_mtime)}
+        blobs.append((name, raw))
+        print(f"{key}: {os.path.basename(path)} x{scale:.3f} -> {img.get_width()}x{img.get_height()}")
+
+    # смещения считаем после того, как известен размер индекса
+    index_len = 0
+    while True:
+        offset = align(len(game.PACK_MAGIC) + 4 + index_len)
+        for name, raw in blobs:
+            entries[name]["offset"] = offset
+            offset = align(offset + len(raw))
+        index = json.dumps(entries, ensure_ascii=False).encode("utf-8")
+        if len(index) == index_len:
+            break
+        index_len = len(index)
+
+    with open(out_path, "wb") as f:
+        f.write(game.PACK_MAGIC)
+        f.write(struct.pack("<I", len(index)))
+        f.write(index)
+        for name, raw in blobs:
+            f.seek(entries[name]["offset"])
+            f.write(raw)
+        f.truncate(offset)
+    return len(blobs), offset
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Сборка пака отмасштабированных спрайтов")
+    parser.add_argument("--config", default=game.CFG_PATH)
+    parser.add_argument("--out", default=game.PACK_PATH)
+    args = parser.parse_args()
+
+    cfg = game.load_json(args.config)
+    if cfg is None:
+        print(f"Нет конфига: {args.config}")
+        sys.exit(1)
+    pygame.init()
+    count, size = build_pack(cfg, args.out)
+    pygame.quit()
+    print(f"Пак записан: {args.out} ({count} спрайтов, {size / 1024:.0f} КБ)")
+
+if __name__ == "__main__":
+    main()
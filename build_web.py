@@ -0,0 +1,103 @@
+# build_web.py — сборка веб-версии Goalie Clicker (для pygbag)
+# Запуск: python build_web.py [--config assets/level_config.json] [--out build/web]
+# затем:  python -m pygbag build/web
+# Спрайты сохраняются уже в том масштабе, в котором их рисует игра (непрозрачные - в JPEG),
+# звуки перекодируются в OGG (нужен ffmpeg), конфиг переписывается на новые файлы.
+
+import os, sys, json, shutil, subprocess
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import game
+
+WEB_FILES = ("main.py", "game.py")
+OGG_QUALITY = "3"  # libvorbis -q:a, примерно 110 кбит/с для стерео
+
+def file_kb(path):
+    return os.path.getsize(path) / 1024
+
+def is_opaque(surf):
+    """Нет ни одного хотя бы частично прозрачного пикселя - можно сохранять в JPEG"""
+    if not surf.get_flags() & pygame.SRCALPHA:
+        return True
+    return pygame.mask.from_surface(surf, 254).count() == surf.get_width() * surf.get_height()
+
+def build_images(cfg, out_dir):
+    """Спрайты сцены -> отмасштабированные файлы; возвращает конфиг с новыми путями и масштабом 1.0"""
+    web_cfg = json.loads(json.dumps(cfg))
+    web_cfg.pop("background", None)  # дубль bg.path, игрой не читается
+    # зоны вратаря пишутся всегда списком "zones" (старые goalieL/goalieR - две зоны)
+    web_cfg["zones"] = game.zone_configs(cfg)
+    web_cfg.pop("goalieL", None)
+    web_cfg.pop("goalieR", None)
+    for key, path, scale in game.scene_sprites(cfg):
+        if not os.path.exists(path):
+            print(f"Пропускаю {key}: нет файла {path}")
+            continue
+        img = game.scale_surface(pygame.image.load(path), scale)
+        name = f"{key}.jpg" if is_opaque(img) else f"{key}.png"
+        out = os.path.join(out_dir, name)
+        pygame.image.save(img, out)
+        entry = web_cfg["bg"] if key == "bg" else web_cfg["zones"][int(key[4:])]
+        entry["path" if key == "bg" else "img"] = name
+        entry["scale"] = 1.0
+        print(f"{key}: {os.path.basename(path)} {file_kb(path):.0f} КБ -> {name} {file_kb(out):.0f} КБ")
+    return web_cfg
+
+def build_sounds(assets_dir, out_dir):
+    """MP3 -> OGG через ffmpeg; без ffmpeg звуки копируются как есть"""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        print("ffmpeg не найден: звуки копируются без перекодирования")
+    for name in sorted(os.listdir(assets_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() != ".mp3":
+            continue
+        src = os.path.join(assets_dir, name)
+        out = os.path.join(out_dir, stem + ".ogg")
+        try:
+            if ffmpeg is None:
+                raise OSError("нет ffmpeg")
+            subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-i", src, "-vn",
+                            "-c:a", "libvorbis", "-q:a", OGG_QUALITY, out], check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            if ffmpeg is not None:
+                print(f"Не удалось перекодировать {name}: {e}")
+            out = os.path.join(out_dir, name)
+            shutil.copyfile(src, out)
+        print(f"{name} {file_kb(src):.0f} КБ -> {os.path.basename(out)} {file_kb(out):.0f} КБ")
+
+def build_web(cfg, out_dir):
+    root = os.path.dirname(os.path.abspath(__file__))
+    assets_out = os.path.join(out_dir, "assets")
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(assets_out)
+    for name in WEB_FILES:
+        shutil.copyfile(os.path.join(root, name), os.path.join(out_dir, name))
+    web_cfg = build_images(cfg, assets_out)
+    with open(os.path.join(assets_out, "level_config.json"), "w", encoding="utf-8") as f:
+        json.dump(web_cfg, f, ensure_ascii=False, indent=2)
+    build_sounds(game.ASSETS_DIR, assets_out)
+    return sum(file_kb(os.path.join(assets_out, n)) for n in os.listdir(assets_out))
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Сборка веб-версии (pygbag) со сжатыми ассетами")
+    parser.add_argument("--config", default=game.CFG_PATH)
+    parser.add_argument("--out", default=os.path.join("build", "web"))
+    args = parser.parse_args()
+
+    cfg = game.load_json(args.config)
+    if cfg is None:
+        print(f"Нет конфига: {args.config}")
+        sys.exit(1)
+    pygame.init()
+    total = build_web(cfg, args.out)
+    pygame.quit()
+    print(f"Веб-версия собрана: {args.out} (ассеты {total:.0f} КБ)")
+    print(f"Дальше: python -m pygbag {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,60 @@
 # Requires: pygame
 # Place level_config.json and assets (keepL.png keepR.png optional sounds) in ./assets/
 
-import os, sys, json, math, random, time
+import os, sys, json, math, random, time, queue, threading, mmap, ntpath, struct, asyncio, heapq, gzip, bisect
+from array import array
+from collections import OrderedDict, deque
 import pygame
+try:
+    import sqlite3
+except ImportError:  # в некоторых веб-сборках Python нет sqlite3
+    sqlite3 = None
+try:
+    from pygame._sdl2 import video as sdl2_video  # текстурный вывод (--renderer gpu/software)
+except ImportError:
+    sdl2_video = None
 import webbrowser  # Добавляем для открытия ссылок
 
 # ---------- Config ----------
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")
 CFG_PATH = os.path.join(ASSETS_DIR, "level_config.json")
+PACK_PATH = os.path.join(ASSETS_DIR, "scene.pack")  # собирается build_pack.py
+PACK_MAGIC = b"GCPACK01"
+PCM_CACHE_DIR = os.path.join(ASSETS_DIR, ".pcm_cache")  # раскодированные MP3
+PCM_MAGIC = b"GCPCM001"
+WEB = sys.platform == "emscripten"  # веб-сборка (pygbag/WASM): без потоков и без записи кэшей на диск
 
 FPS = 60
 ASPECT_W, ASPECT_H = 16, 9
 PUCK_RADIUS = 14
 START_LIVES = 3
+MAX_ZONES = 9  # по умолчанию зоны переключаются цифрами 1..N
+RESERVED_KEYS = ("escape", "m", "f1", "f2", "f3")  # заняты игрой, зоне их назначить нельзя
+WAVE_TYPES = ("burst", "alternate", "sequence")  # виды волн в "waves" конфига
+MAX_WAVE_EVENTS = 10000  # предел шайб во всех волнах уровня (защита от repeat на весь вечер)
+# две зоны старого формата: (ключ конфига, имя, x_rel по умолчанию, клавиши)
+LEGACY_ZONES = (("goalieL", "L", 0.22, ("a", "left")), ("goalieR", "R", 0.62, ("d", "right")))
 MAX_SPEED_MULT = 10  # Увеличена максимальная скорость
 SPEED_RAMP_TIME = 120.0  # seconds to reach max multiplier
+PUCK_SPEED = (260, 360)  # разброс базовой скорости шайбы, пикселей в секунду
+BASE_SPAWN_INTERVAL = 0.9  # интервал спавна на скорости x1, секунды
+SIM_DT = 1.0 / FPS  # фиксированный шаг симуляции
+MAX_FRAME_DT = 0.25  # дольше этого кадр не догоняем (защита от "спирали смерти")
+PUCK_OPACITY_LEVELS = 16  # число заранее отрисованных уровней прозрачности шайбы
+AUDIO_FREQ = 44100
+AUDIO_BUFFER = 512  # размер буфера микшера в сэмплах: меньше - ниже задержка, больше - надёжнее
+SAVE_VOICES = 4  # одновременно звучащих звуков сейва
+TRACE_SECONDS = 10.0  # сколько последних секунд профиля сохраняет F3
+SCORES_PATH = os.path.join(os.path.dirname(__file__), "scores.db")  # рекорды и история партий
+SCORE_HISTORY = 20  # сколько последних партий держится в памяти
+TELEMETRY_DIR = os.path.join(os.path.dirname(__file__), "telemetry")
+TELEMETRY_MAGIC = b"GCTEL001"
+TELEMETRY_CAPACITY = 4096  # записей в кольцевом буфере; сбрасывается на диск по заполнении половины
+TELEMETRY_FILE_SIZE = 1 << 20  # после этого размера (сжатого) файл ротируется
+TELEMETRY_FILES = 5  # сколько файлов хранить вместе с текущим
+CONFIG_POLL_INTERVAL = 0.5  # как часто проверяется mtime level_config.json, секунды
+RENDERERS = ("surface", "gpu", "software")  # --renderer: без gpu-драйвера игра остаётся на поверхностях
+RENDER_SCALES = (0.5, 0.75, 1.0)  # ступени внутреннего разрешения для --render-scale auto
 
 # ---------- Helpers ----------
 def load_json(path):
@@ -24,6 +64,10 @@ def load_json(path):
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
+def save_recording(path, rec):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(rec, f, separators=(",", ":"))
+
 def load_image(path):
     try:
         return pygame.image.load(path).convert_alpha()
@@ -34,62 +78,1016 @@ def find_asset(name):
     p = os.path.join(ASSETS_DIR, name)
     return p if os.path.exists(p) else None
 
+def is_index(v, n):
+    """Номер 0..n-1 из конфига (true/false в JSON - не номер, хоть bool и подкласс int)"""
+    return isinstance(v, int) and not isinstance(v, bool) and 0 <= v < n
+
+def is_zone_ref(zone, zone_names):
+    """Ссылка на зону: номер, имя из "zones" или старые имена L/R"""
+    return is_index(zone, len(zone_names)) or isinstance(zone, str) and (zone in zone_names or zone in ("L", "R"))
+
+def validate_config(cfg):
+    """Текст ошибки, если конфиг нельзя применить, иначе None"""
+    if not isinstance(cfg, dict):
+        return "не JSON-объект (или ошибка разбора)"
+    number = (int, float)
+    for key, field in (("bg", "path"), ("goalieL", "img"), ("goalieR", "img")):
+        entry = cfg.get(key)
+        if entry is None:
+            continue
+        if not isinstance(entry, dict):
+            return f"{key}: ожидается объект"
+        if entry.get(field) is not None and not isinstance(entry[field], str):
+            return f"{key}.{field}: ожидается имя файла"
+        if not isinstance(entry.get("scale", 1.0), number) or entry.get("scale", 1.0) <= 0:
+            return f"{key}.scale: ожидается положительное число"
+        for rel in ("x_rel", "y_rel"):
+            if not isinstance(entry.get(rel, 0.0), number):
+                return f"{key}.{rel}: ожидается число"
+    zones = cfg.get("zones")
+    if zones is not None:
+        if not isinstance(zones, list) or not 2 <= len(zones) <= MAX_ZONES:
+            return f"zones: ожидается список из 2..{MAX_ZONES} зон"
+        for i, zone in enumerate(zones):
+            if not isinstance(zone, dict):
+                return f"zones[{i}]: ожидается объект"
+            if zone.get("img") is not None and not isinstance(zone["img"], str):
+                return f"zones[{i}].img: ожидается имя файла"
+            if not isinstance(zone.get("name", ""), str):
+                return f"zones[{i}].name: ожидается строка"
+            if not isinstance(zone.get("scale", 1.0), number) or zone.get("scale", 1.0) <= 0:
+                return f"zones[{i}].scale: ожидается положительное число"
+            for rel in ("x_rel", "y_rel"):
+                if not isinstance(zone.get(rel, 0.0), number):
+                    return f"zones[{i}].{rel}: ожидается число"
+            keys = zone.get("keys", [])
+            if not (isinstance(keys, list) and all(isinstance(k, str) for k in keys)):
+                return f"zones[{i}].keys: ожидается список имён клавиш"
+            reserved = [k for k in keys if k.lower() in RESERVED_KEYS]
+            if reserved:
+                return f"zones[{i}].keys: клавиши {', '.join(reserved)} заняты игрой"
+    zone_names = [str(zone.get("name", z + 1)) for z, zone in enumerate(zone_configs(cfg))]
+    for key in ("spawns", "targets"):
+        points = cfg.get(key, [])
+        if not isinstance(points, list):
+            return f"{key}: ожидается список"
+        for i, pt in enumerate(points):
+            if not (isinstance(pt, dict) and isinstance(pt.get("x_rel"), number) and isinstance(pt.get("y_rel"), number)):
+                return f"{key}[{i}]: нужны числа x_rel и y_rel"
+            if pt.get("zone") is not None and not is_zone_ref(pt["zone"], zone_names):
+                return f"{key}[{i}].zone: нет зоны {pt['zone']!r}"
+    if not isinstance(cfg.get("random_spawns", True), bool):
+        return "random_spawns: ожидается true или false"
+    waves = cfg.get("waves", [])
+    if not isinstance(waves, list):
+        return "waves: ожидается список"
+    n_spawns = len(cfg.get("spawns") or []) or 2  # без точек в конфиге их две по умолчанию
+    n_targets = len(cfg.get("targets") or []) or 2
+    for i, wave in enumerate(waves):
+        if not isinstance(wave, dict) or wave.get("type") not in WAVE_TYPES:
+            return f"waves[{i}].type: ожидается одно из {', '.join(WAVE_TYPES)}"
+        if not isinstance(wave.get("at"), number) or wave["at"] < 0:
+            return f"waves[{i}].at: ожидается время от начала партии, секунды"
+        for field, default in (("interval", 0.2), ("every", 1.0)):
+            if not isinstance(wave.get(field, default), number) or wave.get(field, default) <= 0:
+                return f"waves[{i}].{field}: ожидается положительное число"
+        for field in ("count", "repeat"):
+            v = wave.get(field, 1)
+            if not isinstance(v, int) or isinstance(v, bool) or v < 1:
+                return f"waves[{i}].{field}: ожидается целое число от 1"
+        if wave.get("repeat", 1) > 1 and "every" not in wave:
+            return f"waves[{i}].every: нужен период для repeat"
+        pairs = wave.get("pairs", [])
+        if not isinstance(pairs, list) or wave["type"] == "sequence" and not pairs:
+            return f"waves[{i}].pairs: ожидается список [спавн, цель]"
+        for pair in pairs:
+            if not (isinstance(pair, list) and len(pair) == 2
+                    and (pair[0] is None or is_index(pair[0], n_spawns))
+                    and (pair[1] is None or is_index(pair[1], n_targets))):
+                return f"waves[{i}].pairs: {pair} - нужны номера спавна и цели (или null)"
+        # одна волна без повторов уже не должна превышать предел ленты: она строится целиком до обрезки
+        size = wave.get("count", 1) * (len(pairs) if wave["type"] == "sequence" else 1)
+        if size > MAX_WAVE_EVENTS:
+            return f"waves[{i}].count: в волне {size} шайб, допускается не больше {MAX_WAVE_EVENTS}"
+        if not is_zone_ref(wave.get("zone", 0), zone_names):
+            return f"waves[{i}].zone: нет зоны {wave['zone']!r}"
+        for field, n in (("spawn", n_spawns), ("target", n_targets)):
+            v = wave.get(field)
+            if v is not None and not is_index(v, n):
+                return f"waves[{i}].{field}: нет точки с номером {v}"
+    line = cfg.get("line")
+    if line is not None and not (isinstance(line, dict) and isinstance(line.get("y_rel", 0.78), number)):
+        return "line.y_rel: ожидается число"
+    return None
+
+def asset_path(p):
+    """Путь из конфига (часто виндовый, с рабочего стола) -> файл в ./assets"""
+    # ntpath.basename понимает и "\\", и "/"
+    return os.path.join(ASSETS_DIR, ntpath.basename(p))
+
+def zone_configs(cfg):
+    """Зоны вратаря: список "zones" из конфига или две старые зоны goalieL/goalieR"""
+    zones = cfg.get("zones")
+    if zones:
+        return [dict(zone, keys=zone.get("keys", [str(z + 1)])) for z, zone in enumerate(zones)]
+    legacy = []
+    for key, name, x_rel, keys in LEGACY_ZONES:
+        zone = dict(cfg.get(key) or {})
+        zone.setdefault("x_rel", x_rel)
+        zone.setdefault("y_rel", 0.55)
+        zone.update(name=name, keys=list(keys))
+        legacy.append(zone)
+    return legacy
+
+def scene_sprites(cfg):
+    """Спрайты сцены из конфига: (ключ, путь в assets, масштаб)"""
+    sprites = []
+    bg = cfg.get("bg")
+    if bg and bg.get("path"):
+        sprites.append(("bg", asset_path(bg["path"]), bg.get("scale", 1.0)))
+    for z, zone in enumerate(zone_configs(cfg)):
+        if zone.get("img"):
+            sprites.append((f"zone{z}", asset_path(zone["img"]), zone.get("scale", 1.0)))
+    return sprites
+
+def key_code(name):
+    """Код клавиши по имени из конфига ("a", "left", "1"), None - если имя неизвестно"""
+    try:
+        return pygame.key.key_code(name)
+    except ValueError:
+        return None
+
+def pack_key(path, scale):
+    return f"{os.path.basename(path)}@{round(scale, 6)}"
+
+def load_sound_cached(path):
+    """Звук из кэша PCM; при промахе MP3 декодируется и кэш записывается на диск"""
+    mixer = pygame.mixer.get_init()
+    if mixer is None:
+        return None
+    if WEB:
+        return pygame.mixer.Sound(path)  # файловая система браузера не переживает перезагрузку страницы
+    st = os.stat(path)
+    header = struct.pack("<iiiqq", mixer[0], mixer[1], mixer[2], st.st_size, int(st.st_mtime))
+    cache = os.path.join(PCM_CACHE_DIR, os.path.basename(path) + ".pcm")
+    try:
+        with open(cache, "rb") as f:
+            if f.read(len(PCM_MAGIC)) == PCM_MAGIC and f.read(len(header)) == header:
+                return pygame.mixer.Sound(buffer=f.read())
+    except OSError:
+        pass
+    snd = pygame.mixer.Sound(path)
+    try:
+        os.makedirs(PCM_CACHE_DIR, exist_ok=True)
+        tmp = cache + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(PCM_MAGIC); f.write(header); f.write(snd.get_raw())
+        os.replace(tmp, cache)
+    except OSError as e:
+        print(f"Не удалось записать кэш звука {cache}: {e}")
+    return snd
+
+class AudioEngine:
+    """Каналы микшера: музыка, пропуск и ограниченный пул голосов для сейвов"""
+    def __init__(self, save_voices=SAVE_VOICES):
+        self.enabled = pygame.mixer.get_init() is not None
+        if not self.enabled:
+            return
+        reserved = 2 + save_voices
+        if pygame.mixer.get_num_channels() < reserved + 2:
+            pygame.mixer.set_num_channels(reserved + 2)
+        # зарезервированные каналы не достанутся Sound.play() из других мест
+        pygame.mixer.set_reserved(reserved)
+        self.music = pygame.mixer.Channel(0)
+        self.miss = pygame.mixer.Channel(1)
+        self.saves = [pygame.mixer.Channel(2 + i) for i in range(save_voices)]
+        self.save_started = [0.0] * save_voices
+
+    def play_music(self, snd, fade_ms=1000):
+        if self.enabled:
+            self.music.play(snd, loops=-1, fade_ms=fade_ms)
+
+    def music_playing(self):
+        return self.enabled and self.music.get_busy()
+
+    def stop_music(self):
+        if self.enabled:
+            self.music.stop()
+
+    def play_save(self, snd):
+        if not self.enabled:
+            return
+        # свободный голос, а если все заняты - забираем самый старый
+        voice = next((i for i, ch in enumerate(self.saves) if not ch.get_busy()), None)
+        if voice is None:
+            voice = min(range(len(self.saves)), key=self.save_started.__getitem__)
+        self.saves[voice].play(snd)
+        self.save_started[voice] = time.perf_counter()
+
+    def stop_saves(self):
+        if self.enabled:
+            for ch in self.saves:
+                ch.stop()
+
+    def play_miss(self, snd):
+        if self.enabled:
+            self.stop_saves()
+            self.miss.play(snd)
+
+class AssetPack:
+    """Пак заранее отмасштабированных спрайтов: сырые RGBA-пиксели в одном mmap-файле"""
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(PACK_MAGIC)] != PACK_MAGIC:
+            raise ValueError("не пак ассетов")
+        (index_len,) = struct.unpack_from("<I", self.data, len(PACK_MAGIC))
+        start = len(PACK_MAGIC) + 4
+        self.index = json.loads(bytes(self.data[start:start + index_len]).decode("utf-8"))
+        self.surfaces = {}
+
+    @classmethod
+    def open(cls, path):
+        if not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except Exception as e:
+            print(f"Пак ассетов не прочитан ({path}): {e}")
+            return None
+
+    def get(self, path, scale):
+        """Спрайт из пака: без декодирования и масштабирования, один раз переведённый в формат экрана"""
+        key = pack_key(path, scale)
+        if key in self.surfaces:
+            return self.surfaces[key]
+        e = self.index.get(key)
+        surf = None
+        if e and os.path.exists(path):
+            st = os.stat(path)
+            # исходник поменялся после сборки пака - пак для него не годится
+            if st.st_size == e["src_size"] and int(st.st_mtime) == e["src_mtime"]:
+                buf = memoryview(self.data)[e["offset"]:e["offset"] + e["w"] * e["h"] * 4]
+                surf = pygame.image.frombuffer(buf, (e["w"], e["h"]), "RGBA")
+                try:
+                    # RGBA из mmap - не формат экрана: без конвертации SDL переводит его на каждом blit
+                    surf = surf.convert_alpha()
+                except pygame.error:
+                    pass  # режим экрана ещё не задан - рисуем из буфера как есть
+        self.surfaces[key] = surf
+        return surf
+
+def scale_surface(surf, scale):
+    w = max(1, int(surf.get_width() * scale))
+    h = max(1, int(surf.get_height() * scale))
+    try:
+        return pygame.transform.smoothscale(surf, (w, h))
+    except Exception:
+        # smoothscale работает только с 24/32-битными поверхностями
+        try:
+            return pygame.transform.scale(surf, (w, h))
+        except Exception:
+            return None
+
+class TextCache:
+    """LRU-кэш отрендеренного текста, ключ: (шрифт, текст, цвет)"""
+    def __init__(self, max_items=256):
+        self.max_items = max_items
+        self.items = OrderedDict()
+
+    def _get(self, key):
+        surf = self.items.get(key)
+        if surf is not None:
+            self.items.move_to_end(key)
+        return surf
+
+    def _put(self, key, surf):
+        self.items[key] = surf
+        if len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+        return surf
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surf = self._get(key)
+        if surf is None:
+            surf = self._put(key, font.render(text, True, color))
+        return surf
+
+    def render_outlined(self, font, text, color, outline_color=(0, 0, 0), width=2):
+        """Текст с обводкой, собранный в одну поверхность один раз"""
+        key = (font, text, color, outline_color, width)
+        surf = self._get(key)
+        if surf is None:
+            inner = font.render(text, True, color)
+            outline = font.render(text, True, outline_color)
+            surf = pygame.Surface((inner.get_width() + width*2, inner.get_height() + width*2), pygame.SRCALPHA)
+            for dx in (-width, 0, width):
+                for dy in (-width, 0, width):
+                    if dx != 0 or dy != 0:
+                        surf.blit(outline, (width + dx, width + dy))
+            surf.blit(inner, (width, width))
+            surf = self._put(key, surf)
+        return surf
+
+    def clear(self):
+        self.items.clear()
+
+class AssetLoader:
+    """Фоновая загрузка картинок и звуков; готовое забирается из очереди в главном потоке.
+
+    Без потоков (threaded=False, браузер) ассеты грузятся по одному за кадр в step()."""
+    def __init__(self, threaded=True):
+        self.threaded = threaded
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.requested = set()
+        self.total = 0
+        self.done = 0
+        self.thread = None
+
+    def request(self, kind, path):
+        if path in self.requested:
+            return
+        self.requested.add(path)
+        self.total += 1
+        self.jobs.put((kind, path))
+        if self.threaded and self.thread is None:
+            self.thread = threading.Thread(target=self._work, name="asset-loader", daemon=True)
+            self.thread.start()
+
+    def _load(self, kind, path):
+        try:
+            # convert_alpha делается уже в главном потоке
+            return pygame.image.load(path) if kind == "image" else load_sound_cached(path)
+        except Exception as e:
+            print(f"Ошибка загрузки {path}: {e}")
+            return None
+
+    def _work(self):
+        while True:
+            kind, path = self.jobs.get()
+            self.results.put((kind, path, self._load(kind, path)))
+
+    def step(self):
+        """Без потока: загрузить следующий ассет из очереди (вызывается раз в кадр)"""
+        if self.threaded:
+            return
+        try:
+            kind, path = self.jobs.get_nowait()
+        except queue.Empty:
+            return
+        self.results.put((kind, path, self._load(kind, path)))
+
+    def poll(self):
+        """Загруженные ассеты (kind, path, data), без ожидания"""
+        ready = []
+        while True:
+            try:
+                item = self.results.get_nowait()
+            except queue.Empty:
+                return ready
+            self.done += 1
+            ready.append(item)
+
+    @property
+    def pending(self):
+        return self.total - self.done
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 1.0
+
+class ScoreStore:
+    """Рекорды и история партий в SQLite (WAL).
+
+    База открывается и читается в фоновом потоке, он же пишет новые партии пачками;
+    лучший счёт и последние партии всегда лежат в памяти, так что кадр никогда не ждёт диск.
+    Без потоков (threaded=False, браузер) партия пишется сразу."""
+    def __init__(self, path, threaded=True, history=SCORE_HISTORY):
+        self.path = path
+        self.threaded = threaded
+        self.best = 0
+        self.games = 0
+        self.ready = False  # база прочитана: до этого best ничего не говорит о прошлых партиях
+        self.recent = deque(maxlen=history)  # (время, счёт, длительность), старые слева
+        self.lock = threading.Lock()
+        self.jobs = queue.Queue()
+        self.db = None
+        self.thread = None
+        if threaded:
+            self.thread = threading.Thread(target=self._work, name="score-writer", daemon=True)
+            self.thread.start()
+        else:
+            self._open()
+
+    def _open(self):
+        if sqlite3 is None:
+            print("sqlite3 недоступен: рекорды не сохраняются")
+            return
+        try:
+            db = sqlite3.connect(self.path)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")  # в WAL этого достаточно, чтобы база не побилась
+            db.execute("CREATE TABLE IF NOT EXISTS sessions (ts REAL, score INTEGER, duration REAL, seed INTEGER)")
+            best, games = db.execute("SELECT COALESCE(MAX(score), 0), COUNT(*) FROM sessions").fetchone()
+            rows = db.execute("SELECT ts, score, duration FROM sessions ORDER BY ts DESC LIMIT ?",
+                              (self.recent.maxlen,)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Ошибка открытия базы рекордов {self.path}: {e}")
+            return
+        with self.lock:
+            # партии, сыгранные до окончания загрузки, новее всего, что есть в базе
+            played = list(self.recent)
+            self.recent.clear()
+            self.recent.extend(reversed(rows))
+            self.recent.extend(played)
+            self.best = max(self.best, best)
+            self.games += games
+            self.ready = True
+        self.db = db
+
+    def _write(self, rows):
+        if self.db is None or not rows:
+            return
+        try:
+            with self.db:  # одна транзакция на пачку
+                self.db.executemany("INSERT INTO sessions VALUES (?, ?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            print(f"Ошибка записи рекордов: {e}")
+
+    def _work(self):
+        self._open()
+        while True:
+            batch = [self.jobs.get()]
+            # всё, что успело накопиться, уходит одной транзакцией
+            while True:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            self._write([row for row in batch if row is not None])
+            if None in batch:
+                break
+        if self.db is not None:
+            self.db.close()
+
+    def add(self, score, duration, seed=None):
+        """Партия закончилась; возвращает рекорд до неё или None, если база ещё не прочитана"""
+        row = (time.time(), score, duration, seed)
+        with self.lock:
+            prev = self.best if self.ready else None
+            self.best = max(self.best, score)
+            self.games += 1
+            self.recent.append(row[:3])
+        if self.threaded:
+            self.jobs.put(row)
+        else:
+            self._write([row])
+        return prev
+
+    def close(self, timeout=2.0):
+        """Дописать очередь и закрыть базу"""
+        if self.thread is not None:
+            self.jobs.put(None)
+            self.thread.join(timeout)
+        elif self.db is not None:
+            self.db.close()
+
+class Telemetry:
+    """Телеметрия исходов шайб.
+
+    Записи фиксированного размера пишутся в заранее выделенный кольцевой буфер (pack_into,
+    без объектов на событие). Накопленное копируется одним куском и в фоновом потоке
+    дописывается gzip-блоком в telemetry.bin.gz; файлы ротируются, так что и память,
+    и место на диске ограничены при любой длине сессии."""
+    # seed партии, шаг, индексы спавна и цели, сторона цели (0 - L), сейв (1) или гол (0),
+    # множитель скорости при спавне, время спавна, время исхода, время последней смены стороны (-1 - не было)
+    RECORD = struct.Struct("<IIHHBBfddd")
+    FIELDS = ("seed", "frame", "spawn", "target", "zone", "saved", "speed_mult", "t_spawn", "t_event", "t_switch")
+
+    def __init__(self, directory, capacity=TELEMETRY_CAPACITY, threaded=True):
+        self.dir = directory
+        self.capacity = capacity
+        self.buf = bytearray(capacity * self.RECORD.size)
+        self.head = 0  # записей всего
+        self.flushed = 0  # из них уже отдано на запись
+        self.dropped = 0  # затёрто до записи (диск не успевал)
+        self.threaded = threaded
+        self.jobs = queue.Queue()
+        self.thread = None
+
+    def record(self, *fields):
+        self.RECORD.pack_into(self.buf, (self.head % self.capacity) * self.RECORD.size, *fields)
+        self.head += 1
+
+    def maybe_flush(self):
+        if self.head - self.flushed >= self.capacity // 2:
+            self.flush()
+
+    def flush(self):
+        """Отдать накопленные записи на запись (копия куска буфера, без ожидания диска)"""
+        n = self.head - self.flushed
+        if n <= 0:
+            return
+        if n > self.capacity:
+            self.dropped += n - self.capacity
+            n = self.capacity
+        size = self.RECORD.size
+        start = (self.head - n) % self.capacity
+        end = start + n
+        if end <= self.capacity:
+            chunk = bytes(self.buf[start * size:end * size])
+        else:
+            chunk = bytes(self.buf[start * size:]) + bytes(self.buf[:(end - self.capacity) * size])
+        self.flushed = self.head
+        if not self.threaded:
+            self._write(chunk)
+            return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._work, name="telemetry-writer", daemon=True)
+            self.thread.start()
+        self.jobs.put(chunk)
+
+    def path(self, n=0):
+        return os.path.join(self.dir, "telemetry.bin.gz" if n == 0 else f"telemetry.{n}.bin.gz")
+
+    def _write(self, chunk):
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            current = self.path()
+            if os.path.exists(current) and os.path.getsize(current) >= TELEMETRY_FILE_SIZE:
+                # telemetry.bin.gz -> telemetry.1.bin.gz -> ...; самый старый затирается
+                for n in range(TELEMETRY_FILES - 1, 0, -1):
+                    if os.path.exists(self.path(n - 1)):
+                        os.replace(self.path(n - 1), self.path(n))
+            header = b""
+            if not os.path.exists(current):
+                fmt = self.RECORD.format.encode("ascii")
+                header = TELEMETRY_MAGIC + struct.pack("<B", len(fmt)) + fmt
+            with open(current, "ab") as f:
+                # каждый сброс - отдельный gzip-блок, gzip.open читает их подряд
+                f.write(gzip.compress(header + chunk))
+        except OSError as e:
+            print(f"Ошибка записи телеметрии: {e}")
+
+    def _work(self):
+        while True:
+            chunk = self.jobs.get()
+            if chunk is None:
+                break
+            self._write(chunk)
+
+    def close(self, timeout=2.0):
+        self.flush()
+        if self.thread is not None:
+            self.jobs.put(None)
+            self.thread.join(timeout)
+
+def load_telemetry(path):
+    """Записи телеметрии из файла: список словарей с полями Telemetry.FIELDS"""
+    with gzip.open(path, "rb") as f:
+        data = f.read()
+    if data[:len(TELEMETRY_MAGIC)] != TELEMETRY_MAGIC:
+        raise ValueError(f"{path}: не файл телеметрии")
+    n = data[len(TELEMETRY_MAGIC)]
+    start = len(TELEMETRY_MAGIC) + 1
+    record = struct.Struct(data[start:start + n].decode("ascii"))
+    return [dict(zip(Telemetry.FIELDS, r)) for r in record.iter_unpack(data[start + n:])]
+
+class FrameProfiler:
+    """Замер фаз кадра для отладочного режима; выключенный профайлер ничего не делает"""
+    def __init__(self, seconds=TRACE_SECONDS):
+        self.enabled = False
+        self.active = False
+        self.seconds = seconds
+        # запас по числу кадров на случай высокой частоты обновления
+        self.frames = deque(maxlen=int(seconds * 240))
+        self.phases = []
+        self.frame_start = self.t = 0.0
+
+    def begin_frame(self):
+        self.active = self.enabled
+        if not self.active:
+            return
+        self.frame_start = self.t = time.perf_counter()
+        self.phases = []
+
+    def mark(self, name):
+        """Закрывает фазу name, начатую предыдущей отметкой"""
+        if not self.active:
+            return
+        t = time.perf_counter()
+        self.phases.append((name, self.t, t))
+        self.t = t
+
+    def end_frame(self):
+        if not self.active:
+            return
+        self.frames.append((self.frame_start, self.t, self.phases))
+        self.active = False
+
+    def frame_times(self, count):
+        """Длительности последних count кадров, мс"""
+        n = len(self.frames)
+        return [(e - s) * 1000.0 for s, e, _ in (self.frames[i] for i in range(max(0, n - count), n))]
+
+    def averages(self, count=60):
+        """Средняя длительность каждой фазы за последние count кадров, мс"""
+        totals = {}
+        n = len(self.frames)
+        used = 0
+        for i in range(max(0, n - count), n):
+            used += 1
+            for name, a, b in self.frames[i][2]:
+                totals[name] = totals.get(name, 0.0) + (b - a)
+        return {name: v * 1000.0 / used for name, v in totals.items()} if used else {}
+
+    def export_chrome_trace(self, path):
+        """Последние seconds секунд в формате Chrome trace / Perfetto"""
+        if not self.frames:
+            return 0
+        last = self.frames[-1][1]
+        frames = [f for f in self.frames if f[0] >= last - self.seconds]
+        t0 = frames[0][0]
+        events = []
+        for s, e, phases in frames:
+            events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": (s - t0) * 1e6, "dur": (e - s) * 1e6})
+            for name, a, b in phases:
+                events.append({"name": name, "ph": "X", "pid": 1, "tid": 1,
+                               "ts": (a - t0) * 1e6, "dur": (b - a) * 1e6})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(frames)
+
 # ---------- Game classes ----------
+_puck_sprites = {}
+
+def get_puck_sprite(opacity, radius=PUCK_RADIUS):
+    """Общий спрайт шайбы для квантованного уровня прозрачности"""
+    level = int(round(max(0, min(255, opacity)) * (PUCK_OPACITY_LEVELS - 1) / 255.0))
+    s = _puck_sprites.get((level, radius))
+    if s is None:
+        s = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
+        alpha = int(round(level * 255.0 / (PUCK_OPACITY_LEVELS - 1)))
+        pygame.draw.circle(s, (0, 0, 0, alpha), (radius, radius), radius)
+        _puck_sprites[(level, radius)] = s
+    return s
+
 class Puck:
-    def __init__(self, sx, sy, tx, ty, base_speed):
-        self.x = sx; self.y = sy
-        self.tx = tx; self.ty = ty
+    """Представление одной шайбы из PuckStore (для совместимости со старым кодом)"""
+    __slots__ = ("store", "i")
+
+    def __init__(self, store, i):
+        self.store = store
+        self.i = i
+
+    x = property(lambda self: self.store.position(self.i, self.store.now)[0])
+    y = property(lambda self: self.store.position(self.i, self.store.now)[1])
+    tx = property(lambda self: self.store.tx[self.i])
+    ty = property(lambda self: self.store.ty[self.i])
+    vx = property(lambda self: self.store.vx[self.i])
+    vy = property(lambda self: self.store.vy[self.i])
+    opacity = property(lambda self: self.store.opacity[self.i])
+    fade = property(lambda self: bool(self.store.fade[self.i]))
+    alive = property(lambda self: bool(self.store.alive[self.i]))
+
+    def blit_item(self, ox, oy):
+        """Пара (спрайт, позиция) для Surface.blits"""
+        return get_puck_sprite(self.opacity), (ox + int(self.x) - PUCK_RADIUS, oy + int(self.y) - PUCK_RADIUS)
+
+    def draw(self, surf, ox, oy):
+        surf.blit(*self.blit_item(ox, oy))
+
+class PuckStore:
+    """Шайбы в виде набора параллельных массивов (struct-of-arrays) с очередью исходов.
+
+    Шайба летит по прямой с постоянной скоростью, поэтому её позиция - функция времени
+    от спавна, а момент исхода (пересечение line_y или приход в цель) известен уже при
+    спавне. Исходы лежат в куче, за шаг разбираются только наступившие - стоимость счёта
+    не зависит от числа шайб в полёте. Слоты умерших шайб переиспользуются."""
+    COLUMNS = ("sx", "sy", "tx", "ty", "vx", "vy", "t0", "t_end", "opacity", "zone", "spawn", "target", "mult")
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.sx = array("d"); self.sy = array("d")  # точка спавна
+        self.tx = array("d"); self.ty = array("d")
+        self.vx = array("d"); self.vy = array("d")
+        self.t0 = array("d")  # время спавна (секунды симуляции)
+        self.t_end = array("d")  # время прихода в цель
+        self.opacity = array("B")
+        self.zone = array("b")  # номер зоны вратаря, которая ловит шайбу
+        self.spawn = array("H"); self.target = array("H")  # индексы точек спавна и цели (для телеметрии)
+        self.mult = array("f")  # множитель скорости при спавне
+        self.fade = bytearray()
+        self.alive = bytearray()
+        self.free = []  # свободные слоты
+        self.fading = []  # отбитые шайбы, удаляются в начале следующего шага
+        self.events = []  # куча (момент исхода, слот)
+        self.count = 0
+        self.now = 0.0  # время конца последнего шага
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self.alive) or not self.alive[i]:
+            raise IndexError(i)
+        return Puck(self, i)
+
+    def __iter__(self):
+        return (Puck(self, i) for i, a in enumerate(self.alive) if a)
+
+    def position(self, i, t):
+        """Позиция шайбы в момент t (после прихода в цель она стоит в цели)"""
+        dt = max(0.0, min(t, self.t_end[i]) - self.t0[i])  # шайба, заспавненная позже t, стоит в точке спавна
+        return self.sx[i] + self.vx[i] * dt, self.sy[i] + self.vy[i] * dt
+
+    def outcome_time(self, i, line_y, now):
+        """Момент исхода: пересечение line_y после now, а если линии на пути нет - приход в цель"""
+        vy = self.vy[i]
+        if vy:
+            t = self.t0[i] + (line_y - self.sy[i]) / vy
+            if now < t <= self.t_end[i]:
+                return t
+        return self.t_end[i]
+
+    def add(self, sx, sy, tx, ty, base_speed, zone, t0, line_y, spawn=0, target=0, mult=1.0):
         dx = tx - sx; dy = ty - sy
         d = math.hypot(dx, dy) or 1.0
-        self.vx = dx / d * base_speed
-        self.vy = dy / d * base_speed
-        self.fade = False
-        self.opacity = 255
-        self.alive = True
-
-    def update(self, dt):
-        self.x += self.vx * dt
-        self.y += self.vy * dt
-        if self.fade:
-            # Вместо плавного исчезания - сразу удаляем
-            self.alive = False
+        t_end = t0 + d / base_speed if base_speed > 0 else float("inf")
+        values = (sx, sy, tx, ty, dx / d * base_speed, dy / d * base_speed, t0, t_end, 255, zone, spawn, target, mult)
+        if self.free:
+            i = self.free.pop()
+            for name, v in zip(self.COLUMNS, values):
+                getattr(self, name)[i] = v
+            self.fade[i] = 0
+            self.alive[i] = 1
+        else:
+            i = len(self.alive)
+            for name, v in zip(self.COLUMNS, values):
+                getattr(self, name).append(v)
+            self.fade.append(0)
+            self.alive.append(1)
+        self.count += 1
+        heapq.heappush(self.events, (self.outcome_time(i, line_y, t0), i))
+        return i
 
-    def draw(self, surf, ox, oy):
-        # draw as circle with alpha
-        s = pygame.Surface((PUCK_RADIUS*2, PUCK_RADIUS*2), pygame.SRCALPHA)
-        col = (0, 0, 0, int(max(0, min(255, self.opacity))))
-        pygame.draw.circle(s, col, (PUCK_RADIUS, PUCK_RADIUS), PUCK_RADIUS)
-        surf.blit(s, (ox + int(self.x) - PUCK_RADIUS, oy + int(self.y) - PUCK_RADIUS))
+    def remove(self, i):
+        self.alive[i] = 0
+        self.fade[i] = 0
+        self.free.append(i)
+        self.count -= 1
+
+    def settle(self, i):
+        """Шайба отбита: видна до конца шага, потом удаляется"""
+        self.fade[i] = 1
+        self.fading.append(i)
+
+    def begin_step(self):
+        # Вместо плавного исчезания - отбитые шайбы сразу удаляем
+        for i in self.fading:
+            self.remove(i)
+        self.fading = []
+
+    def due(self, t):
+        """Исходы не позже момента t по порядку: [(слот, момент исхода)]"""
+        events = self.events
+        alive, fade = self.alive, self.fade
+        out = []
+        while events and events[0][0] <= t:
+            te, i = heapq.heappop(events)
+            # отбитая или удалённая шайба второй раз не засчитывается
+            if alive[i] and not fade[i]:
+                out.append((i, te))
+        return out
+
+    def next_outcome(self):
+        """Слот шайбы с ближайшим исходом или None"""
+        return self.events[0][1] if self.events else None
+
+    def reschedule(self, line_y, now):
+        """line_y поменялась (перезагрузка конфига): пересчитываем все ожидающие исходы"""
+        self.events = [(self.outcome_time(i, line_y, now), i)
+                       for i, (a, f) in enumerate(zip(self.alive, self.fade)) if a and not f]
+        heapq.heapify(self.events)
+
+    def blit_items(self, ox, oy, t, r=PUCK_RADIUS):
+        """Список (спрайт, позиция) для всех шайб в момент t"""
+        return [(get_puck_sprite(o, r), (ox + int(sx + vx * (max(t0, min(t, te)) - t0)) - r, oy + int(sy + vy * (max(t0, min(t, te)) - t0)) - r))
+                for sx, sy, vx, vy, t0, te, o, a
+                in zip(self.sx, self.sy, self.vx, self.vy, self.t0, self.t_end, self.opacity, self.alive) if a]
+
+class WaveTimeline:
+    """Волны из конфига, заранее развёрнутые в ленту спавнов, отсортированную по времени.
+    -1 в spawn/target - случайная точка (выбирается ГСЧ партии в момент спавна),
+    zone >= 0 при target == -1 - случайная цель этой зоны."""
+    def __init__(self, waves=(), n_zones=2, zone_index=None):
+        events = []
+        for wave in waves:
+            interval = wave.get("interval", 0.2)
+            spawn, target = wave.get("spawn", -1), wave.get("target", -1)
+            if wave["type"] == "sequence":
+                # фиксированные пары [спавн, цель], null - случайно
+                pattern = [(-1 if s is None else s, -1 if t is None else t, -1) for s, t in wave["pairs"]]
+                pattern *= wave.get("count", 1)
+            elif wave["type"] == "alternate":
+                # цели по очереди из каждой зоны, начиная с "zone"
+                # номер или имя зоны ("L"/"R" и имена из "zones") переводятся в номер один раз здесь
+                first = wave.get("zone", 0)
+                if zone_index is not None:
+                    first = zone_index(first) or 0
+                pattern = [(spawn, -1, (first + k) % n_zones) for k in range(wave.get("count", 2 * n_zones))]
+            else:
+                pattern = [(spawn, target, -1)] * wave.get("count", 5)
+            for r in range(wave.get("repeat", 1)):
+                start = wave["at"] + r * wave.get("every", 0.0)
+                events.extend((start + k * interval, s, t, z) for k, (s, t, z) in enumerate(pattern))
+                if len(events) > MAX_WAVE_EVENTS:
+                    break
+        events.sort(key=lambda e: e[0])
+        if len(events) > MAX_WAVE_EVENTS:
+            print(f"Волны обрезаны до {MAX_WAVE_EVENTS} шайб")
+            del events[MAX_WAVE_EVENTS:]
+        self.t = array("d", (e[0] for e in events))
+        self.spawn = array("h", (e[1] for e in events))
+        self.target = array("h", (e[2] for e in events))
+        self.zone = array("b", (e[3] for e in events))
+
+    def __len__(self):
+        return len(self.t)
+
+    def seek(self, t):
+        """Номер первого события не раньше t (после горячей перезагрузки посреди партии)"""
+        return bisect.bisect_left(self.t, t)
+
+class TextureBackend:
+    """Вывод через pygame._sdl2.video: картинки один раз загружаются в текстуры, кадр собирается
+    копиями текстур, а растягивание холста до размера окна делает рендерер"""
+    MAX_SPRITES = 256  # текстур спрайтов в кэше (шайбы, вратари, надписи)
+    RGB_MASKS = (0xFF0000, 0xFF00, 0xFF)  # формат потоковой текстуры по умолчанию (ARGB8888, альфа в старшем байте)
+
+    def __init__(self, window, renderer):
+        self.window = window
+        self.renderer = renderer
+        self.size = window.size
+        self.scale = (1.0, 1.0)  # пиксели холста -> пиксели окна
+        self.sprites = OrderedDict()  # id(поверхности) -> (поверхность, текстура); ссылка держит id занятым
+        self.layers = {}  # имя слоя -> (поверхность, текстура)
+        self.frame_ready = False  # кадр игры уже собран из текстур, present только показывает его
+
+    @classmethod
+    def open(cls, size, software=False, vsync=False):
+        """Окно с рендерером или None, если драйвера нет (тогда игра рисует через поверхности)"""
+        if sdl2_video is None:
+            print("pygame._sdl2 недоступен, вывод через поверхности")
+            return None
+        window = None
+        try:
+            # скрытый режим экрана нужен только для convert()/convert_alpha() при загрузке картинок
+            pygame.display.set_mode((1, 1), pygame.HIDDEN)
+            window = sdl2_video.Window("Goalie Clicker", size=size, fullscreen_desktop=True)
+            if software:
+                # программный рендерер SDL есть везде - им проверяется этот путь на машине без GPU
+                index = [d.name for d in sdl2_video.get_drivers()].index("software")
+                renderer = sdl2_video.Renderer(window, index=index, accelerated=0, vsync=vsync)
+            else:
+                renderer = sdl2_video.Renderer(window, accelerated=1, vsync=vsync)
+        except (pygame.error, RuntimeError, ValueError) as e:
+            print(f"Текстурный вывод недоступен ({e}), вывод через поверхности")
+            if window is not None:
+                window.destroy()
+            return None
+        return cls(window, renderer)
+
+    def resize(self, size, canvas_size):
+        self.size = size
+        self.scale = (size[0] / canvas_size[0], size[1] / canvas_size[1])
+        self.layers.clear()
+
+    def dest(self, x, y, w, h):
+        """Прямоугольник холста -> прямоугольник окна (края округляются одинаково, без щелей между копиями)"""
+        sx, sy = self.scale
+        x0, y0 = int(x * sx), int(y * sy)
+        return (x0, y0, int((x + w) * sx) - x0, int((y + h) * sy) - y0)
+
+    def texture(self, surf):
+        entry = self.sprites.get(id(surf))
+        if entry is None:
+            entry = self.sprites[id(surf)] = (surf, sdl2_video.Texture.from_surface(self.renderer, surf))
+            if len(self.sprites) > self.MAX_SPRITES:
+                self.sprites.popitem(last=False)
+        else:
+            self.sprites.move_to_end(id(surf))
+        return entry[1]
+
+    def blit(self, surf, pos):
+        w, h = surf.get_size()
+        self.texture(surf).draw(dstrect=self.dest(pos[0], pos[1], w, h))
+
+    def blits(self, items):
+        for surf, (x, y) in items:
+            w, h = surf.get_size()
+            self.texture(surf).draw(dstrect=self.dest(x, y, w, h))
+
+    def layer(self, name, surf, pos=(0, 0), changed=False):
+        """Большой слой (фон, отладка, HUD): пиксели заливаются в ту же текстуру, только если слой изменился;
+        текстура пересоздаётся лишь при новом размере"""
+        entry = self.layers.get(name)
+        if entry is None or entry[0] is not surf or changed:
+            texture = entry[1] if entry is not None else None
+            if surf.get_bytesize() != 4 or surf.get_masks()[:3] != self.RGB_MASKS:
+                # update() копирует байты как есть - другой формат пикселей загружается с конвертацией
+                texture = sdl2_video.Texture.from_surface(self.renderer, surf)
+            else:
+                if texture is None or texture.get_rect().size != surf.get_size():
+                    texture = sdl2_video.Texture(self.renderer, surf.get_size(), streaming=True)
+                    if surf.get_flags() & pygame.SRCALPHA:
+                        texture.blend_mode = 1  # SDL_BLENDMODE_BLEND, как from_surface для слоя с прозрачностью
+                texture.update(surf)
+            entry = self.layers[name] = (surf, texture)
+        w, h = surf.get_size()
+        entry[1].draw(dstrect=self.dest(pos[0], pos[1], w, h))
+
+    def fill_rect(self, color, rect):
+        self.renderer.draw_color = color
+        self.renderer.fill_rect(self.dest(*rect))
+
+    def clear(self):
+        self.renderer.draw_color = (0, 0, 0, 255)
+        self.renderer.clear()
+
+    def present(self):
+        self.renderer.present()
+        self.frame_ready = False
+
+    def close(self):
+        self.sprites.clear()
+        self.layers.clear()
+        self.window.destroy()
 
 # ---------- Main game ----------
 class Game:
-    def __init__(self):
+    def __init__(self, headless=False, screen_size=(1920, 1080), async_assets=True, audio_buffer=AUDIO_BUFFER,
+                 render_fps=FPS, vsync=False, render_scale=1.0, renderer="surface"):
+        # headless - симуляция без окна, звука и отрисовки (для балансировки)
+        self.headless = headless
+        if headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        # pre_init действует только до pygame.init()
+        pygame.mixer.pre_init(AUDIO_FREQ, -16, 2, audio_buffer)
         pygame.init()
-        pygame.mixer.pre_init(44100, -16, 2, 512)
         
         # Определяем платформу
-        self.is_mobile = self.detect_mobile()
+        self.is_mobile = False if headless else self.detect_mobile()
         
+        # текстурный вывод (renderer "gpu" или "software"); без драйвера - обычные поверхности
+        self.gpu = None
+        if not headless and renderer != "surface":
+            size = pygame.display.get_desktop_sizes()[0]
+            self.gpu = TextureBackend.open(size, software=renderer == "software", vsync=vsync)
+
         # Настройки экрана для разных платформ
-        if self.is_mobile:
+        if headless:
+            self.display = None
+            self.display_size = screen_size
+        elif self.gpu is not None:
+            self.display = None
+            self.display_size = self.gpu.size
+        elif self.is_mobile:
             # Для мобильных - полноэкранный режим
-            self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-            self.screen_w, self.screen_h = self.screen.get_size()
-            # Используем меньший шрифт для мобильных
-            self.font = pygame.font.SysFont("Arial", 20)
-            self.small = pygame.font.SysFont("Arial", 14)
+            self.display = self.open_display((0, 0), vsync)
+            self.display_size = self.display.get_size()
         else:
             # Для ПК - обычный полноэкранный
             self.info = pygame.display.Info()
-            self.screen_w = self.info.current_w
-            self.screen_h = self.info.current_h
-            self.screen = pygame.display.set_mode((self.screen_w, self.screen_h), pygame.FULLSCREEN)
-            self.font = pygame.font.SysFont("Arial", 22)
-            self.small = pygame.font.SysFont("Arial", 16)
-            
-        pygame.display.set_caption("Goalie Clicker")
-        self.clock = pygame.time.Clock()
-        self.big_font = pygame.font.SysFont("Arial", 48, bold=True)  # Для надписи "ГОЛ"
+            self.display = self.open_display((self.info.current_w, self.info.current_h), vsync)
+            self.display_size = self.display.get_size()
+
+        # внутреннее разрешение: кадр рисуется в уменьшенный холст и растягивается на экран одним проходом
+        # "auto" - масштаб подбирается между партиями по измеренному времени отрисовки
+        self.auto_render_scale = render_scale == "auto"
+        self.render_scale = 1.0 if self.auto_render_scale or headless else float(render_scale)
+        self.render_cost = None  # сглаженное время отрисовки + вывода кадра, секунды
+        self.speed_scale = 1.0  # скорость шайб в пикселях холста на пиксель экрана
+        self.setup_render_target()
+
+        if not headless:
+            pygame.display.set_caption("Goalie Clicker")
+        # частота отрисовки (0 - без ограничения или по vsync); симуляция всё равно идёт шагами sim_dt,
+        # а шайбы рисуются с интерполяцией между двумя последними шагами
+        self.render_fps = 0 if vsync else render_fps
+        self.interpolate = True
+
+        # время начала кадра и опорная точка "реальное время -> время симуляции" для событий
+        self.last_frame_time = time.perf_counter()
+        self.input_clock = (self.last_frame_time, 0.0)
+        self.stamped_events = []  # (событие, время) забранные между фазами прошлого кадра
+        self.text_cache = TextCache()
 
         # Отладочный режим
         self.debug_mode = False
@@ -98,29 +1096,55 @@ class Game:
         # compute centered 16:9 rect
         self.compute_game_rect()
 
+        # картинки и звуки грузятся в фоне, стартовый экран рисуется сразу
+        self.loader = AssetLoader(threaded=not WEB) if async_assets and not headless else None
+        self.images = {}  # путь -> загруженная поверхность (None, если не удалось)
+        self.critical_paths = set()  # без этих картинок игру не начинаем
+        self.sound_slots = {}  # путь -> (атрибут, громкость)
+        self.pack = None if headless else AssetPack.open(PACK_PATH)
+
         # load config
         self.cfg = load_json(CFG_PATH) or {}
+        self.cfg_stamp = self.config_stamp()
+        self.cfg_poll_timer = 0.0
         self.load_scene_from_config()
 
         # sounds
         self.snd_game = None
         self.snd_save = None
         self.snd_miss = None
-        self.load_sounds()
+        self.audio = None
+        if not headless:
+            self.audio = AudioEngine()
+            self.load_sounds()
 
         self.muted = False
-        
-        # Кнопки - разные размеры для мобильных и ПК
-        if self.is_mobile:
-            self.mute_button_rect = pygame.Rect(0, 0, 140, 40)
-            self.subscribe_button_rect = pygame.Rect(0, 0, 200, 45)
-        else:
-            self.mute_button_rect = pygame.Rect(0, 0, 120, 30)
-            self.subscribe_button_rect = pygame.Rect(0, 0, 180, 35)
+        # рекорды: в headless (симуляции, повторы) ничего не пишем
+        self.scores = None if headless else ScoreStore(SCORES_PATH, threaded=not WEB)
+        self.telemetry = None if headless else Telemetry(TELEMETRY_DIR, threaded=not WEB)
             
         self.vk_url = "https://vk.com/club233320861"
 
         # gameplay
+        self.sim_dt = SIM_DT
+        # параметры сложности (sweep.py перебирает их без правки констант)
+        self.max_speed_mult = MAX_SPEED_MULT
+        self.speed_ramp_time = SPEED_RAMP_TIME
+        self.puck_speed = PUCK_SPEED
+        self.base_spawn_interval = BASE_SPAWN_INTERVAL
+        self.legacy_spawning = False  # повтор записи до версии 4: старый таймер спавна
+        self.replay = None  # воспроизводимая запись (Replay) или None
+        self.replay_speed = 1.0
+        self.record_path = None
+
+        # профайлер фаз кадра, работает только в отладочном режиме (F1)
+        self.profiler = FrameProfiler()
+        self.profiler_overlay = None
+        self.profiler_overlay_frame = 0
+
+        # dirty rects: обновляем на экране только изменившиеся области
+        self.dirty_rects = False
+        self.prev_rects = []
         self.reset_game_state()
 
         # UI
@@ -132,6 +1156,80 @@ class Game:
         self.goal_text_timer = 0.0
         self.goal_text_duration = 2.0
 
+    def open_display(self, size, vsync):
+        if vsync:
+            try:
+                # vsync в pygame 2 работает только вместе с SCALED/OPENGL
+                return pygame.display.set_mode(size, pygame.FULLSCREEN | pygame.SCALED, vsync=1)
+            except pygame.error as e:
+                print(f"VSync недоступен: {e}")
+        return pygame.display.set_mode(size, pygame.FULLSCREEN)
+
+    def setup_render_target(self):
+        """Поверхность кадра: сам экран или уменьшенный холст при render_scale < 1, плюс шрифты и кнопки под неё"""
+        dw, dh = self.display_size
+        s = self.render_scale
+        self.screen_w, self.screen_h = max(1, int(dw * s)), max(1, int(dh * s))
+        if self.headless:
+            self.screen = self.canvas = None
+            self.font = self.small = self.big_font = None
+        else:
+            # при текстурном выводе экрана-поверхности нет: экраны меню рисуются в холст
+            self.canvas = pygame.Surface((self.screen_w, self.screen_h)).convert() if s < 1.0 or self.gpu is not None else None
+            self.screen = self.canvas if self.canvas is not None else self.display
+            if self.gpu is not None:
+                self.gpu.resize(self.display_size, (self.screen_w, self.screen_h))
+            # Используем меньший шрифт для мобильных
+            self.font = pygame.font.SysFont("Arial", self.px(20 if self.is_mobile else 22))
+            self.small = pygame.font.SysFont("Arial", self.px(14 if self.is_mobile else 16))
+            self.big_font = pygame.font.SysFont("Arial", self.px(48), bold=True)  # Для надписи "ГОЛ"
+        self.hud_layer = None  # HUD для текстурного вывода и то, что на нём нарисовано
+        self.hud_key = None
+        # Кнопки - разные размеры для мобильных и ПК
+        if self.is_mobile:
+            self.mute_button_rect = pygame.Rect(0, 0, self.px(140), self.px(40))
+            self.subscribe_button_rect = pygame.Rect(0, 0, self.px(200), self.px(45))
+        else:
+            self.mute_button_rect = pygame.Rect(0, 0, self.px(120), self.px(30))
+            self.subscribe_button_rect = pygame.Rect(0, 0, self.px(180), self.px(35))
+        self.puck_radius = max(1, self.px(PUCK_RADIUS))
+
+    def px(self, v):
+        """Размер в пикселях экрана -> пиксели холста"""
+        return max(1, int(round(v * self.render_scale)))
+
+    def to_canvas(self, pos):
+        """Координаты экрана (мышь, касание) -> координаты холста"""
+        return (int(pos[0] * self.screen_w / self.display_size[0]),
+                int(pos[1] * self.screen_h / self.display_size[1]))
+
+    def set_render_scale(self, scale):
+        """Смена внутреннего разрешения: холст, шрифты, game_rect и сцена пересобираются"""
+        if scale == self.render_scale:
+            return
+        self.render_scale = scale
+        self.setup_render_target()
+        self.text_cache.clear()
+        self.profiler_overlay = None
+        self.compute_game_rect()
+        self.load_scene_from_config()
+
+    def adjust_render_scale(self):
+        """Автомасштаб: дорогая отрисовка - на ступень ниже, с большим запасом - на ступень выше"""
+        if self.render_cost is None:
+            return  # ещё не мерили
+        budget = 1.0 / (self.render_fps or FPS)
+        i = RENDER_SCALES.index(self.render_scale) if self.render_scale in RENDER_SCALES else len(RENDER_SCALES) - 1
+        if self.render_cost > budget * 0.8 and i > 0:
+            i -= 1
+        elif self.render_cost < budget * 0.3 and i < len(RENDER_SCALES) - 1:
+            i += 1
+        else:
+            return
+        print(f"Внутреннее разрешение: x{RENDER_SCALES[i]} (отрисовка {self.render_cost * 1000:.1f} мс)")
+        self.set_render_scale(RENDER_SCALES[i])
+        self.render_cost = None
+
     def detect_mobile(self):
         """Определяем мобильное устройство"""
         try:
@@ -156,104 +1254,342 @@ class Game:
         gy = (self.screen_h - target_h) // 2
         self.game_rect = pygame.Rect(gx, gy, target_w, target_h)
 
-    def load_scene_from_config(self):
+    def load_scene_from_config(self, incremental=False):
+        # кэш масштабированных спрайтов и статичный слой сбрасываются при каждой загрузке сцены;
+        # incremental (горячая перезагрузка конфига) - кэш сохраняется, заново масштабируется
+        # только то, у чего поменялся масштаб, а слой пересобирается, только если поменялась картинка фона
+        old_bg = (getattr(self, "bg_img", None), getattr(self, "bg_x", None), getattr(self, "bg_y", None))
+        old_zone_imgs = list(getattr(self, "zone_imgs", ()))
+        if not incremental:
+            self.scaled_cache = {}
+            self.static_layer = None
+        self.debug_layer = None  # маркеры, линия и game_rect могли поменяться
+        self.full_redraw = True
+
         # background
         self.bg_surf = None
+        self.bg_path = None
         self.bg_x = 0; self.bg_y = 0; self.bg_scale = 1.0
         bg = self.cfg.get("bg")
         if bg:
             p = bg.get("path")
             if p:
-                candidate = os.path.join(ASSETS_DIR, os.path.basename(p))
+                candidate = asset_path(p)
                 if os.path.exists(candidate):
-                    self.bg_surf = load_image(candidate)
                     self.bg_scale = bg.get("scale", 1.0)
+                    self.bg_path = candidate
+                    self.bg_surf = self.get_image(candidate, self.bg_scale)
                     self.bg_x = int(bg.get("x_rel", 0.0) * self.game_rect.w)
                     self.bg_y = int(bg.get("y_rel", 0.0) * self.game_rect.h)
 
-        # goalies
-        self.goalieL_surf = None
-        self.goalieR_surf = None
-        self.goalieL_x = int(self.game_rect.w * 0.22)
-        self.goalieL_y = int(self.game_rect.h * 0.55)
-        self.goalieR_x = int(self.game_rect.w * 0.62)
-        self.goalieR_y = int(self.game_rect.h * 0.55)
-        self.goalieL_scale = 1.0
-        self.goalieR_scale = 1.0
-
-        gL = self.cfg.get("goalieL")
-        if gL:
-            p = gL.get("img")
-            if p:
-                path = os.path.join(ASSETS_DIR, os.path.basename(p))
-                if os.path.exists(path):
-                    self.goalieL_surf = load_image(path)
-            self.goalieL_x = int(gL.get("x_rel", 0.22) * self.game_rect.w)
-            self.goalieL_y = int(gL.get("y_rel", 0.55) * self.game_rect.h)
-            self.goalieL_scale = gL.get("scale", 1.0)
-
-        gR = self.cfg.get("goalieR")
-        if gR:
-            p = gR.get("img")
+        # зоны вратаря: спрайт, позиция и клавиши каждой; старые goalieL/goalieR - это две зоны
+        self.zone_names = []
+        self.zone_paths = []
+        self.zone_surfs = []
+        self.zone_scales = []
+        self.zone_pos = []
+        self.zone_keys = {}  # код клавиши -> номер зоны
+        zones = zone_configs(self.cfg)
+        reserved = {key_code(name) for name in RESERVED_KEYS}
+        for z, zone in enumerate(zones):
+            path = surf = None
+            scale = zone.get("scale", 1.0)
+            p = zone.get("img")
             if p:
-                path = os.path.join(ASSETS_DIR, os.path.basename(p))
-                if os.path.exists(path):
-                    self.goalieR_surf = load_image(path)
-            self.goalieR_x = int(gR.get("x_rel", 0.62) * self.game_rect.w)
-            self.goalieR_y = int(gR.get("y_rel", 0.55) * self.game_rect.h)
-            self.goalieR_scale = gR.get("scale", 1.0)
+                candidate = asset_path(p)
+                if os.path.exists(candidate):
+                    path = candidate
+                    surf = self.get_image(candidate, scale)
+            self.zone_names.append(str(zone.get("name", z + 1)))
+            self.zone_paths.append(path)
+            self.zone_surfs.append(surf)
+            self.zone_scales.append(scale)
+            self.zone_pos.append((int(zone.get("x_rel", (z + 0.25) / len(zones)) * self.game_rect.w),
+                                  int(zone.get("y_rel", 0.55) * self.game_rect.h)))
+            for name in zone["keys"]:
+                code = key_code(name)
+                if code is None or code in reserved:
+                    print(f"Зона {self.zone_names[-1]}: клавиша {name!r} неизвестна или занята игрой")
+                else:
+                    self.zone_keys[code] = z
 
         # markers (spawns and targets)
         self.spawns = []
         self.targets = []
+        self.target_specs = []  # "zone" из конфига цели (номер, имя или None)
         for s in self.cfg.get("spawns", []):
             self.spawns.append((s["x_rel"] * self.game_rect.w, s["y_rel"] * self.game_rect.h))
         for t in self.cfg.get("targets", []):
             self.targets.append((t["x_rel"] * self.game_rect.w, t["y_rel"] * self.game_rect.h))
+            self.target_specs.append(t.get("zone"))
 
         # line
         if self.cfg.get("line"):
             self.line_y = int(self.cfg["line"].get("y_rel", 0.78) * self.game_rect.h)
         else:
             self.line_y = int(self.game_rect.h * 0.78)
+        self.ensure_markers()
 
-    def load_sounds(self):
+        # волны: лента спавнов собирается один раз, в кадре только курсор по ней
+        self.waves = WaveTimeline(self.cfg.get("waves", []), len(self.zone_names), self.zone_index)
+        self.random_spawns = self.cfg.get("random_spawns", True)
+
+        self.prescale_scene()
+        if incremental:
+            # исходник ещё грузится в фоне (например, его не было в паке) - пока рисуем старый спрайт
+            pending = lambda path: path and path not in self.images and self.loader is not None
+            if self.bg_img is None and pending(self.bg_path):
+                self.bg_img = old_bg[0]
+            for z, old in enumerate(old_zone_imgs[:len(self.zone_imgs)]):
+                if self.zone_imgs[z] is None and pending(self.zone_paths[z]):
+                    self.zone_imgs[z] = old
+            # спрайты со старым масштабом больше не нужны
+            used = {id(self.bg_img), *map(id, self.zone_imgs)}
+            self.scaled_cache = {k: v for k, v in self.scaled_cache.items() if id(v) in used}
+            if (self.bg_img, self.bg_x, self.bg_y) != old_bg:
+                self.static_layer = None
+
+    def ensure_markers(self):
+        """Хотя бы по две точки спавна и цели"""
+        w, h = self.game_rect.w, self.game_rect.h
+        if not self.spawns or not self.targets:
+            self.debug_layer = None
+        if not self.spawns:
+            self.spawns = [(int(w*0.08), int(h*0.25)), (int(w*0.92), int(h*0.25))]
+        if not self.targets:
+            self.targets = [(int(w*0.35), int(h*0.45)), (int(w*0.65), int(h*0.45))]
+            self.target_specs = []
+        self.resolve_target_zones()
+
+    def zone_index(self, zone):
+        """Номер зоны по номеру или имени ("L"/"R" - старые записи и сценарии), None - если такой нет"""
+        if isinstance(zone, int) and 0 <= zone < len(self.zone_names):
+            return zone
+        if zone in self.zone_names:
+            return self.zone_names.index(zone)
+        if zone == "L":
+            return 0
+        if zone == "R":
+            return len(self.zone_names) - 1  # правая - крайняя зона, а не вторая по счёту
+        return None
+
+    def resolve_target_zones(self):
+        """Зона каждой цели считается один раз при загрузке: в горячем цикле сравниваются только номера"""
+        n = len(self.zone_names)
+        self.target_zones = array("b")
+        for ti, (tx, ty) in enumerate(self.targets):
+            spec = self.target_specs[ti] if ti < len(self.target_specs) else None
+            zone = None if spec is None else self.zone_index(spec)
+            if zone is None:
+                # полоса по ширине поля; при двух зонах - как раньше, левая/правая половина
+                zone = min(n - 1, max(0, int(tx / self.game_rect.w * n)))
+            self.target_zones.append(zone)
+        # цели каждой зоны (для волн "alternate") и точка зоны для кликов: центр её целей, а без целей - позиция спрайта
+        self.zone_targets = [[ti for ti, tz in enumerate(self.target_zones) if tz == z] for z in range(n)]
+        self.zone_anchors = []
+        for z in range(n):
+            pts = [self.targets[ti] for ti in self.zone_targets[z]]
+            if pts:
+                self.zone_anchors.append((sum(x for x, _ in pts) / len(pts), sum(y for _, y in pts) / len(pts)))
+            else:
+                self.zone_anchors.append(self.zone_pos[z])
+
+    def config_stamp(self):
         try:
-            p = find_asset("game.mp3")
-            if p: 
-                self.snd_game = pygame.mixer.Sound(p)
-                self.snd_game.set_volume(0.7)
-            
-            p = find_asset("save.mp3") or find_asset("Звук пойманной шайбы.mp3") or find_asset("save.MP3")
-            if p: 
-                self.snd_save = pygame.mixer.Sound(p)
-                self.snd_save.set_volume(1.0)
-            
-            p = find_asset("propusk.mp3") or find_asset("prpusk.MP3")
-            if p: 
-                self.snd_miss = pygame.mixer.Sound(p)
-                self.snd_miss.set_volume(1.0)
-        except Exception as e:
-            print(f"Ошибка загрузки звуков: {e}")
-            self.snd_game = self.snd_save = self.snd_miss = None
+            st = os.stat(CFG_PATH)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
 
-    def reset_game_state(self):
-        self.pucks = []
+    def poll_config(self, dt):
+        """Горячая перезагрузка level_config.json по mtime (раз в CONFIG_POLL_INTERVAL)"""
+        self.cfg_poll_timer += dt
+        if self.cfg_poll_timer < CONFIG_POLL_INTERVAL or self.replay is not None:
+            return
+        self.cfg_poll_timer = 0.0
+        stamp = self.config_stamp()
+        if stamp is None or stamp == self.cfg_stamp:
+            return
+        # битый файл тоже запоминаем: повторно разбираем только после следующего сохранения
+        self.cfg_stamp = stamp
+        try:
+            cfg = load_json(CFG_PATH)
+        except (OSError, ValueError) as e:
+            print(f"Конфиг не применён: {e}")
+            return
+        error = validate_config(cfg)
+        if error:
+            print(f"Конфиг не применён: {error}")
+            return
+        self.cfg = cfg
+        line_y = self.line_y
+        if self.loader is None and not self.headless:
+            # даже без фоновой загрузки при старте новые картинки посреди игры не декодируются в кадре
+            self.loader = AssetLoader(threaded=not WEB)
+        self.load_scene_from_config(incremental=True)
+        if self.line_y != line_y:
+            self.pucks.reschedule(self.line_y, self.frame * self.sim_dt)
+        self.wave_pos = self.waves.seek(self.frame * self.sim_dt)
+        # зон могло стать меньше: вратарь и очередь ввода остаются в последней
+        last = len(self.zone_names) - 1
+        self.goalie_zone = min(self.goalie_zone, last)
+        self.queued_zone = min(self.queued_zone, last)
+        self.pending_inputs = deque((f, o, min(z, last)) for f, o, z in self.pending_inputs)
+        # шайбы в полёте ловит зона их цели по новой таблице (иначе номер зоны мог остаться >= N)
+        pucks = self.pucks
+        for i, alive in enumerate(pucks.alive):
+            if alive:
+                ti = pucks.target[i]
+                pucks.zone[i] = self.target_zones[ti] if ti < len(self.target_zones) else min(pucks.zone[i], last)
+        print("Конфиг перезагружен")
+
+    def get_image(self, path, scale=None):
+        """Картинка сцены: из кэша, синхронно или заявкой фоновому загрузчику"""
+        if self.headless:
+            return None
+        if self.pack is not None and scale is not None and self.pack.get(path, scale * self.render_scale) is not None:
+            return None  # уже отмасштабированная версия есть в паке, PNG не нужен
+        self.critical_paths.add(path)
+        if path in self.images:
+            return self.images[path]
+        if self.loader is None:
+            self.images[path] = load_image(path)
+            return self.images[path]
+        self.loader.request("image", path)
+        return None
+
+    def poll_assets(self):
+        """Подхватываем то, что загрузилось в фоне"""
+        if self.loader is None:
+            return
+        scene_changed = False
+        for kind, path, data in self.loader.poll():
+            if kind == "image":
+                try:
+                    self.images[path] = data.convert_alpha() if data else None
+                except Exception:
+                    self.images[path] = None
+                scene_changed = True
+            else:
+                name, volume = self.sound_slots[path]
+                if data:
+                    data.set_volume(volume)
+                setattr(self, name, data)
+                # музыка догрузилась, когда игра уже идёт
+                if name == "snd_game" and data and not self.show_start_screen and not self.show_game_over:
+                    self.play_bg_music()
+        if scene_changed:
+            self.load_scene_from_config(incremental=True)
+
+    def critical_assets_ready(self):
+        return all(p in self.images for p in self.critical_paths)
+
+    def wait_for_assets(self):
+        """Дождаться всех фоновых загрузок (для бенчмарков и повторов)"""
+        while self.loader is not None and self.loader.pending:
+            if self.loader.threaded:
+                time.sleep(0.005)
+            self.loader.step()
+            self.poll_assets()
+
+    def get_scaled(self, key, surf, scale, path=None):
+        """Масштабированный спрайт из кэша (ключ: ассет, его файл, масштаб, размер game_rect)"""
+        scale *= self.render_scale
+        if path and self.pack is not None:
+            img = self.pack.get(path, scale)
+            if img is not None:
+                return img
+        if surf is None:
+            return None
+        # файл в ключе: после смены картинки в конфиге при том же масштабе старый спрайт не подойдёт
+        ck = (key, path, scale, self.game_rect.size)
+        img = self.scaled_cache.get(ck)
+        if img is None:
+            img = scale_surface(surf, scale)
+            self.scaled_cache[ck] = img
+        return img
+
+    def prescale_scene(self):
+        """Заполняем кэш заранее, чтобы в кадре не было ни одного smoothscale"""
+        self.bg_img = self.get_scaled("bg", self.bg_surf, self.bg_scale, self.bg_path)
+        self.zone_imgs = [self.get_scaled(f"zone{z}", surf, scale, path)
+                          for z, (surf, scale, path) in enumerate(zip(self.zone_surfs, self.zone_scales, self.zone_paths))]
+
+    def get_static_layer(self):
+        """Неизменная часть кадра: фон, панель, картинка и подвал с разработчиком"""
+        if self.static_layer is None:
+            layer = pygame.Surface((self.screen_w, self.screen_h)).convert()
+            layer.fill((10, 18, 30))
+            pygame.draw.rect(layer, (14,30,55), self.game_rect)
+            if self.bg_img:
+                layer.blit(self.bg_img, (self.game_rect.x + int(self.bg_x), self.game_rect.y + int(self.bg_y)))
+            self.draw_developer_info(layer)
+            self.static_layer = layer
+        return self.static_layer
+
+    def set_screen_size(self, w, h):
+        """Смена геометрии экрана: пересчитываем холст, game_rect и сцену"""
+        self.display_size = (w, h)
+        if self.display is not None:
+            self.display = pygame.display.get_surface()
+        self.setup_render_target()
+        self.text_cache.clear()
+        self.compute_game_rect()
+        self.load_scene_from_config()
+
+    def set_field_size(self, w, h):
+        """Игровое поле заданного размера по центру экрана (для повторов записей с другого экрана)"""
+        if self.game_rect.size == (w, h):
+            return
+        self.game_rect = pygame.Rect((self.screen_w - w) // 2, (self.screen_h - h) // 2, w, h)
+        self.load_scene_from_config()
+
+    def load_sounds(self):
+        sounds = (
+            # .ogg - сжатые варианты из build_web.py, в браузере MP3 поддерживается не везде
+            ("snd_game", 0.7, find_asset("game.ogg") or find_asset("game.mp3")),
+            ("snd_save", 1.0, find_asset("save.ogg") or find_asset("save.mp3") or find_asset("Звук пойманной шайбы.mp3") or find_asset("save.MP3")),
+            ("snd_miss", 1.0, find_asset("propusk.ogg") or find_asset("propusk.mp3") or find_asset("propusk.MP3") or find_asset("prpusk.MP3")),
+        )
+        for name, volume, p in sounds:
+            if not p:
+                continue
+            if self.loader is not None:
+                self.sound_slots[p] = (name, volume)
+                self.loader.request("sound", p)
+                continue
+            try:
+                snd = load_sound_cached(p)
+                snd.set_volume(volume)
+                setattr(self, name, snd)
+            except Exception as e:
+                print(f"Ошибка загрузки звуков: {e}")
+
+    def reset_game_state(self, seed=None):
+        # у каждой партии свой ГСЧ: одинаковый seed + одинаковый ввод = одинаковая партия
+        self.seed = seed if seed is not None else random.randrange(1 << 31)
+        self.rng = random.Random(self.seed)
+        self.frame = 0  # номер шага симуляции
+        self.accumulator = 0.0
+        # опорная точка прошлой партии дала бы событиям того же кадра время старой партии
+        self.input_clock = (time.perf_counter(), 0.0)
+        self.input_log = []  # [номер шага, зона, смещение внутри шага в секундах] для записи
+        self.pending_inputs = deque()  # (номер шага, смещение, зона), ещё не применённые симуляцией
+        self.queued_zone = 0  # зона после всех уже поставленных в очередь смен
+        self.last_switch_time = -1.0  # момент последней смены зоны (секунды симуляции), для телеметрии
+        self.miss_frames = []
+        self.new_record = False
+        self.pucks = PuckStore()
         self.spawn_timer = 0.0
-        self.base_spawn_interval = 0.9
+        self.wave_pos = 0  # следующее событие в self.waves
         self.score = 0
         self.lives = START_LIVES
         self.elapsed = 0.0
         self.speed_mult = 1.0
-        # current goalie side L or R
-        self.goalie_side = "L"
+        # текущая зона вратаря (номер в zone_pos)
+        self.goalie_zone = 0
         # ensure there are at least two spawn/targets
-        if not self.spawns:
-            w,h = self.game_rect.w, self.game_rect.h
-            self.spawns = [(int(w*0.08), int(h*0.25)), (int(w*0.92), int(h*0.25))]
-        if not self.targets:
-            w,h = self.game_rect.w, self.game_rect.h
-            self.targets = [(int(w*0.35), int(h*0.45)), (int(w*0.65), int(h*0.45))]
+        self.ensure_markers()
         
         # Сбрасываем анимацию гола
         self.show_goal_text = False
@@ -263,14 +1599,14 @@ class Game:
         if self.snd_game and not self.muted:
             try:
                 pygame.mixer.stop()
-                self.snd_game.play(loops=-1, fade_ms=1000)
+                self.audio.play_music(self.snd_game)
             except Exception as e:
                 print(f"Ошибка воспроизведения музыки: {e}")
 
     def stop_bg_music(self):
         if self.snd_game:
             try:
-                self.snd_game.stop()
+                self.audio.stop_music()
             except Exception:
                 pass
 
@@ -278,8 +1614,8 @@ class Game:
         """Воспроизведение звука сейва - не прерывает предыдущий"""
         if self.snd_save and not self.muted:
             try:
-                # Воспроизводим без остановки предыдущего - звуки могут накладываться
-                self.snd_save.play()
+                # Звуки могут накладываться, но не больше SAVE_VOICES одновременно
+                self.audio.play_save(self.snd_save)
             except Exception as e:
                 print(f"Ошибка воспроизведения звука сейва: {e}")
 
@@ -287,47 +1623,96 @@ class Game:
         """Воспроизведение звука пропуска гола"""
         if self.snd_miss and not self.muted:
             try:
-                # Останавливаем все звуки сейва перед воспроизведением пропуска
-                if self.snd_save:
-                    self.snd_save.stop()
-                self.snd_miss.play()
+                # Звуки сейва останавливаются перед воспроизведением пропуска
+                self.audio.play_miss(self.snd_miss)
             except Exception as e:
                 print(f"Ошибка воспроизведения звука пропуска: {e}")
 
-    def spawn_puck(self):
-        si = random.randrange(len(self.spawns))
-        ti = random.randrange(len(self.targets))
+    def spawn_puck(self, si=-1, ti=-1, zone=-1, t0=None):
+        """Шайба из точки si в цель ti (-1 - случайно, с zone >= 0 - случайная цель этой зоны) в момент t0"""
+        if si < 0:
+            si = self.rng.randrange(len(self.spawns))
+        if ti < 0:
+            zone_targets = self.zone_targets[zone] if 0 <= zone < len(self.zone_targets) else None
+            ti = self.rng.choice(zone_targets) if zone_targets else self.rng.randrange(len(self.targets))
         sx, sy = self.spawns[si]
         tx, ty = self.targets[ti]
-        base_speed = random.uniform(260, 360) * self.speed_mult
-        p = Puck(sx, sy, tx, ty, base_speed)
-        self.pucks.append(p)
+        base_speed = self.rng.uniform(*self.puck_speed) * self.speed_mult * self.speed_scale
+        if t0 is None:
+            t0 = self.frame * self.sim_dt
+        # зона цели уже посчитана при загрузке сцены
+        self.pucks.add(sx, sy, tx, ty, base_speed, self.target_zones[ti], t0, self.line_y, si, ti, self.speed_mult)
 
-    def handle_click_toggle_goalie(self):
-        # toggle side
-        self.goalie_side = "R" if self.goalie_side == "L" else "L"
+    def set_goalie_zone(self, zone, at=None):
+        """Смена зоны вратаря в момент at (секунды симуляции) или в начале текущего шага"""
+        if self.replay is not None:
+            return  # во время повтора ввод игрока не влияет на вратаря
+        if zone == self.queued_zone:
+            return
+        frame, offset = self.frame, 0.0
+        if at is not None:
+            # не дальше, чем симуляция успеет дойти за один кадр - иначе смена застрянет в голове очереди
+            at = min(at, self.frame * self.sim_dt + self.accumulator + MAX_FRAME_DT * self.replay_speed)
+            f = int(at // self.sim_dt)
+            # то, что уже просчитано, не переигрываем
+            if f >= self.frame:
+                frame, offset = f, at - f * self.sim_dt
+        self.queued_zone = zone
+        self.pending_inputs.append((frame, offset, zone))
+        self.input_log.append([frame, zone, offset])
+
+    def handle_click_goalie(self, pos, at=None):
+        """Клик по полю: при двух зонах - переключение, иначе - зона, чья точка ближе к клику"""
+        if len(self.zone_anchors) == 2:
+            self.set_goalie_zone(1 - self.queued_zone, at)
+            return
+        x, y = pos[0] - self.game_rect.x, pos[1] - self.game_rect.y
+        zone = min(range(len(self.zone_anchors)),
+                   key=lambda z: (self.zone_anchors[z][0] - x) ** 2 + (self.zone_anchors[z][1] - y) ** 2)
+        self.set_goalie_zone(zone, at)
+
+    def take_step_inputs(self):
+        """Смены зоны, приходящиеся на текущий шаг: [(смещение, зона)]"""
+        pending = self.pending_inputs
+        inputs = []
+        while pending and pending[0][0] <= self.frame:
+            frame, offset, zone = pending.popleft()
+            inputs.append((offset if frame == self.frame else 0.0, zone))
+        return inputs
+
+    def wall_to_sim(self, t):
+        """Момент реального времени -> секунды симуляции (по опорной точке текущего кадра)"""
+        wall_now, sim_now = self.input_clock
+        return sim_now - (wall_now - t) * self.replay_speed
+
+    def make_recording(self):
+        """Запись партии: seed, шаг и смены зоны вратаря"""
+        return {"version": 4, "seed": self.seed, "dt": self.sim_dt, "field": list(self.game_rect.size),
+                "speed_scale": self.speed_scale, "inputs": self.input_log,
+                "score": self.score, "miss_frames": self.miss_frames}
 
     def draw_goalie(self):
         gr = self.game_rect
-        if self.goalie_side == "L" and self.goalieL_surf:
-            img = pygame.transform.smoothscale(self.goalieL_surf, (int(self.goalieL_surf.get_width()*self.goalieL_scale), int(self.goalieL_surf.get_height()*self.goalieL_scale)))
-            self.screen.blit(img, (gr.x + int(self.goalieL_x), gr.y + int(self.goalieL_y)))
-        elif self.goalie_side == "R" and self.goalieR_surf:
-            img = pygame.transform.smoothscale(self.goalieR_surf, (int(self.goalieR_surf.get_width()*self.goalieR_scale), int(self.goalieR_surf.get_height()*self.goalieR_scale)))
-            self.screen.blit(img, (gr.x + int(self.goalieR_x), gr.y + int(self.goalieR_y)))
-        else:
-            # fallback rectangle marker
-            gx = gr.x + (int(gr.w*0.28) if self.goalie_side == "L" else int(gr.w*0.62))
-            gy = gr.y + int(gr.h*0.55)
-            pygame.draw.rect(self.screen, (12,60,120), (gx-40, gy-40, 80, 80))
+        x, y = self.zone_pos[self.goalie_zone]
+        img = self.zone_imgs[self.goalie_zone]
+        if img:
+            return self.screen.blit(img, (gr.x + x, gr.y + y))
+        # fallback rectangle marker
+        return pygame.draw.rect(self.screen, (12,60,120), (gr.x + x - self.px(40), gr.y + y - self.px(40), self.px(80), self.px(80)))
+
+    def draw_pucks(self):
+        """Все шайбы одним вызовом blits"""
+        ox, oy = self.game_rect.x, self.game_rect.y
+        # позиция - функция времени, так что шайбы рисуются ровно на момент кадра, а не шага
+        t = self.frame * self.sim_dt + (self.accumulator if self.interpolate else 0.0)
+        return self.screen.blits(self.pucks.blit_items(ox, oy, t, self.puck_radius))
 
     def render_hud(self):
         # lives as hearts
         lives_text = f"Жизней: ∞" if (self.debug_mode and self.infinite_lives) else f"Жизней: {self.lives}"
-        txt_score = self.font.render(f"Счёт: {self.score}", True, (255,255,255))
-        txt_lives = self.font.render(lives_text, True, (255,180,180))
-        self.screen.blit(txt_score, (18, 12))
-        self.screen.blit(txt_lives, (18, 42))
+        txt_score = self.text_cache.render(self.font, f"Счёт: {self.score}", (255,255,255))
+        txt_lives = self.text_cache.render(self.font, lives_text, (255,180,180))
+        rects = [self.screen.blit(txt_score, (self.px(18), self.px(12))), self.screen.blit(txt_lives, (self.px(18), self.px(42)))]
         
         # Текстовая кнопка mute
         button_x = int(self.screen_w * 0.74)
@@ -336,19 +1721,20 @@ class Game:
         
         # Рисуем кнопку
         button_color = (80, 80, 100) if not self.muted else (120, 60, 60)
-        pygame.draw.rect(self.screen, button_color, self.mute_button_rect, border_radius=6)
+        rects.append(pygame.draw.rect(self.screen, button_color, self.mute_button_rect, border_radius=6))
         pygame.draw.rect(self.screen, (150, 150, 170), self.mute_button_rect, 2, border_radius=6)
         
         # Текст кнопки
         mute_text = "Выкл звук" if not self.muted else "Вкл звук"
-        text_surf = self.small.render(mute_text, True, (255, 255, 255))
+        text_surf = self.text_cache.render(self.small, mute_text, (255, 255, 255))
         text_rect = text_surf.get_rect(center=self.mute_button_rect.center)
         self.screen.blit(text_surf, text_rect)
         
         # Отладочная информация
         if self.debug_mode:
-            debug_txt = self.small.render(f"DEBUG: Spawns: {len(self.spawns)}, Targets: {len(self.targets)}, LineY: {self.line_y}", True, (255, 100, 100))
-            self.screen.blit(debug_txt, (18, 72))
+            debug_txt = self.text_cache.render(self.small, f"DEBUG: Spawns: {len(self.spawns)}, Targets: {len(self.targets)}, LineY: {self.line_y}", (255, 100, 100))
+            rects.append(self.screen.blit(debug_txt, (self.px(18), self.px(72))))
+        return rects
 
     def draw_goal_text(self):
         """Отрисовка надписи ГОЛ в координатах (0.469, 0.242)"""
@@ -357,41 +1743,35 @@ class Game:
             goal_x = int(self.screen_w * 0.469)
             goal_y = int(self.screen_h * 0.242)
             
-            # Создаем текст с красным цветом и черной обводкой
-            goal_text = self.big_font.render("ГОЛ!", True, (255, 50, 50))
-            
-            # Рисуем черную обводку
-            for dx in [-2, 0, 2]:
-                for dy in [-2, 0, 2]:
-                    if dx != 0 or dy != 0:
-                        outline_text = self.big_font.render("ГОЛ!", True, (0, 0, 0))
-                        self.screen.blit(outline_text, (goal_x - outline_text.get_width()//2 + dx, goal_y - outline_text.get_height()//2 + dy))
-            
-            # Рисуем основной текст
-            self.screen.blit(goal_text, (goal_x - goal_text.get_width()//2, goal_y - goal_text.get_height()//2))
+            # Текст с красным цветом и черной обводкой (собирается один раз)
+            goal_text = self.text_cache.render_outlined(self.big_font, "ГОЛ!", (255, 50, 50))
+            return self.screen.blit(goal_text, (goal_x - goal_text.get_width()//2, goal_y - goal_text.get_height()//2))
+        return None
 
-    def draw_developer_info(self):
+    def draw_developer_info(self, surf=None):
         """Отрисовка информации о разработчике внизу экрана"""
+        if surf is None:
+            surf = self.screen
         # Разработчик
-        dev_text = self.small.render("Разработчик: Петров Дмитрий", True, (200, 200, 200))
+        dev_text = self.text_cache.render(self.small, "Разработчик: Петров Дмитрий", (200, 200, 200))
         dev_x = self.screen_w // 2 - dev_text.get_width() // 2
-        dev_y = self.screen_h - 120
-        self.screen.blit(dev_text, (dev_x, dev_y))
+        dev_y = self.screen_h - self.px(120)
+        surf.blit(dev_text, (dev_x, dev_y))
         
         # Кнопка ПОДПИСАТЬСЯ
         subscribe_x = self.screen_w // 2 - self.subscribe_button_rect.width // 2
-        subscribe_y = self.screen_h - 85
+        subscribe_y = self.screen_h - self.px(85)
         self.subscribe_button_rect = pygame.Rect(subscribe_x, subscribe_y, self.subscribe_button_rect.width, self.subscribe_button_rect.height)
         
         # Рисуем кнопку подписки
         subscribe_color = (70, 100, 170)  # Синий цвет ВК
-        pygame.draw.rect(self.screen, subscribe_color, self.subscribe_button_rect, border_radius=8)
-        pygame.draw.rect(self.screen, (100, 130, 200), self.subscribe_button_rect, 2, border_radius=8)
+        pygame.draw.rect(surf, subscribe_color, self.subscribe_button_rect, border_radius=8)
+        pygame.draw.rect(surf, (100, 130, 200), self.subscribe_button_rect, 2, border_radius=8)
         
         # Текст кнопки
-        subscribe_text = self.small.render("ПОДПИСАТЬСЯ", True, (255, 255, 255))
+        subscribe_text = self.text_cache.render(self.small, "ПОДПИСАТЬСЯ", (255, 255, 255))
         subscribe_text_rect = subscribe_text.get_rect(center=self.subscribe_button_rect.center)
-        self.screen.blit(subscribe_text, subscribe_text_rect)
+        surf.blit(subscribe_text, subscribe_text_rect)
 
     def open_vk_community(self):
         """Открытие сообщества ВК в браузере"""
@@ -402,45 +1782,56 @@ class Game:
             print(f"Ошибка при открытии ссылки: {e}")
 
     def draw_debug_markers(self):
-        """Отрисовка отладочных маркеров"""
+        """Отрисовка отладочных маркеров (слой собирается один раз на сцену)"""
+        if self.debug_layer is None:
+            self.debug_layer = self.build_debug_layer()
+        layer, pos = self.debug_layer
+        self.screen.blit(layer, pos)
+
+    def build_debug_layer(self):
+        """Спавны, цели, линия и все траектории S×T на прозрачной поверхности, обрезанной по содержимому"""
+        # подписи уникальны для каждой точки - рендерим их напрямую, мимо LRU-кэша текста
+        surf = pygame.Surface((self.screen_w, self.screen_h), pygame.SRCALPHA)
         gr = self.game_rect
         
         # Отрисовка спавнов (зеленые круги)
         for i, (sx, sy) in enumerate(self.spawns):
-            pygame.draw.circle(self.screen, (0, 255, 0), (gr.x + int(sx), gr.y + int(sy)), 8)
+            pygame.draw.circle(surf, (0, 255, 0), (gr.x + int(sx), gr.y + int(sy)), 8)
             spawn_text = self.small.render(f"S{i}", True, (0, 255, 0))
-            self.screen.blit(spawn_text, (gr.x + int(sx) + 10, gr.y + int(sy) - 10))
+            surf.blit(spawn_text, (gr.x + int(sx) + 10, gr.y + int(sy) - 10))
             
             # Координаты спавнов
             coord_text = self.small.render(f"({sx/gr.w:.3f}, {sy/gr.h:.3f})", True, (200, 255, 200))
-            self.screen.blit(coord_text, (gr.x + int(sx) + 10, gr.y + int(sy) + 10))
+            surf.blit(coord_text, (gr.x + int(sx) + 10, gr.y + int(sy) + 10))
         
         # Отрисовка целей (красные круги)
         for i, (tx, ty) in enumerate(self.targets):
-            pygame.draw.circle(self.screen, (255, 0, 0), (gr.x + int(tx), gr.y + int(ty)), 8)
-            target_text = self.small.render(f"T{i}", True, (255, 0, 0))
-            self.screen.blit(target_text, (gr.x + int(tx) + 10, gr.y + int(ty) - 10))
+            pygame.draw.circle(surf, (255, 0, 0), (gr.x + int(tx), gr.y + int(ty)), 8)
+            target_text = self.small.render(f"T{i}:{self.zone_names[self.target_zones[i]]}", True, (255, 0, 0))
+            surf.blit(target_text, (gr.x + int(tx) + 10, gr.y + int(ty) - 10))
             
             # Координаты целей
             coord_text = self.small.render(f"({tx/gr.w:.3f}, {ty/gr.h:.3f})", True, (255, 200, 200))
-            self.screen.blit(coord_text, (gr.x + int(tx) + 10, gr.y + int(ty) + 10))
+            surf.blit(coord_text, (gr.x + int(tx) + 10, gr.y + int(ty) + 10))
         
         # Отрисовка линии (синяя линия)
         line_y_abs = gr.y + self.line_y
-        pygame.draw.line(self.screen, (0, 100, 255), (gr.x, line_y_abs), (gr.x + gr.w, line_y_abs), 3)
+        pygame.draw.line(surf, (0, 100, 255), (gr.x, line_y_abs), (gr.x + gr.w, line_y_abs), 3)
         line_text = self.small.render(f"Line: {self.line_y/gr.h:.3f}", True, (0, 100, 255))
-        self.screen.blit(line_text, (gr.x + 10, line_y_abs + 5))
+        surf.blit(line_text, (gr.x + 10, line_y_abs + 5))
         
         # Отрисовка траекторий для всех возможных комбинаций спавн-цель
         for sx, sy in self.spawns:
             for tx, ty in self.targets:
-                pygame.draw.line(self.screen, (255, 255, 0, 100), 
+                pygame.draw.line(surf, (255, 255, 0), 
                                (gr.x + int(sx), gr.y + int(sy)), 
                                (gr.x + int(tx), gr.y + int(ty)), 1)
+        box = surf.get_bounding_rect()
+        return surf.subsurface(box).copy(), box.topleft
 
     def draw_cursor_coordinates(self):
         """Отрисовка координат под курсором"""
-        mx, my = pygame.mouse.get_pos()
+        mx, my = self.to_canvas(pygame.mouse.get_pos())
         gr = self.game_rect
         
         # Проверяем, находится ли курсор внутри игровой области
@@ -460,145 +1851,391 @@ class Game:
                             text_rect.width + 4, text_rect.height + 4))
             self.screen.blit(coord_text, text_rect)
 
-    def run(self):
-        running = True
-        self.play_bg_music()
-        while running:
-            dt = self.clock.tick(FPS) / 1000.0
-            self.elapsed += dt
-            
-            # Обновляем таймер надписи ГОЛ
-            if self.show_goal_text:
-                self.goal_text_timer += dt
-                if self.goal_text_timer >= self.goal_text_duration:
-                    self.show_goal_text = False
-                    self.goal_text_timer = 0.0
-            
-            # gradually ramp speed multiplier from 1.0 to MAX_SPEED_MULT over SPEED_RAMP_TIME seconds
-            t = min(self.elapsed, SPEED_RAMP_TIME) / max(1e-6, SPEED_RAMP_TIME)
-            self.speed_mult = 1.0 + (MAX_SPEED_MULT - 1.0) * t
+    def draw_profiler_overlay(self):
+        """График времени кадра и средние по фазам (обновляется несколько раз в секунду)"""
+        prof = self.profiler
+        self.profiler_overlay_frame += 1
+        if self.profiler_overlay is None or self.profiler_overlay_frame >= FPS // 4:
+            self.profiler_overlay_frame = 0
+            graph_w, graph_h = 240, 60
+            averages = sorted(prof.averages().items(), key=lambda kv: -kv[1])
+            line_h = self.small.get_linesize()
+            surf = pygame.Surface((graph_w + 8, graph_h + 8 + line_h * (len(averages) + 1)), pygame.SRCALPHA)
+            surf.fill((0, 0, 0, 170))
+            # столбики последних кадров; шкала до 2 кадров при FPS, линия - бюджет одного кадра
+            budget = 1000.0 / FPS
+            times = prof.frame_times(graph_w // 2)
+            for i, ms in enumerate(times):
+                h = min(graph_h, int(ms / (budget * 2) * graph_h))
+                col = (80, 220, 120) if ms <= budget else (240, 90, 70)
+                pygame.draw.rect(surf, col, (4 + i * 2, 4 + graph_h - h, 2, h))
+            y_budget = 4 + graph_h - graph_h // 2
+            pygame.draw.line(surf, (255, 255, 255), (4, y_budget), (4 + graph_w, y_budget), 1)
+            y = graph_h + 8
+            last = times[-1] if times else 0.0
+            surf.blit(self.small.render(f"frame {last:.2f} ms  [F3 - trace]", True, (255, 255, 255)), (4, y))
+            for name, ms in averages:
+                y += line_h
+                surf.blit(self.small.render(f"{name:<7} {ms:6.2f} ms", True, (200, 220, 255)), (4, y))
+            self.profiler_overlay = surf
+        self.screen.blit(self.profiler_overlay, (self.screen_w - self.profiler_overlay.get_width() - 18, 100))
 
-            for ev in pygame.event.get():
-                if ev.type == pygame.QUIT:
-                    running = False; break
-                elif ev.type == pygame.KEYDOWN:
-                    if ev.key == pygame.K_ESCAPE:
-                        running = False; break
-                    elif ev.key in (pygame.K_LEFT, pygame.K_a):
-                        self.goalie_side = "L"
-                    elif ev.key in (pygame.K_RIGHT, pygame.K_d):
-                        self.goalie_side = "R"
-                    elif ev.key == pygame.K_m:
-                        self.toggle_mute()
-                    elif ev.key == pygame.K_F1:  # Переключение отладочного режима
-                        self.debug_mode = not self.debug_mode
-                    elif ev.key == pygame.K_F2:  # Переключение бесконечных жизней
-                        self.infinite_lives = not self.infinite_lives
-                elif ev.type == pygame.MOUSEBUTTONDOWN:
-                    self.handle_mouse_click(ev.pos)
-                elif ev.type == pygame.FINGERDOWN:
-                    # Обработка касаний для мобильных устройств
-                    mx = ev.x * self.screen_w
-                    my = ev.y * self.screen_h
-                    self.handle_mouse_click((mx, my))
+    def dump_trace(self):
+        path = time.strftime("trace_%Y%m%d_%H%M%S.json")
+        try:
+            n = self.profiler.export_chrome_trace(path)
+            print(f"Трасса профайлера ({n} кадров) сохранена: {path}")
+        except Exception as e:
+            print(f"Ошибка сохранения трассы: {e}")
 
-            if self.show_start_screen:
-                self.draw_start_screen()
-                pygame.display.flip()
-                continue
+    def step(self, dt):
+        """Один шаг симуляции: рампа скорости, спавн, движение шайб и счёт"""
+        self.update_speed(dt)
+        self.update_spawning(dt)
+        self.update_pucks(dt)
+        self.frame += 1
 
-            if self.show_game_over:
-                self.draw_game_over()
-                pygame.display.flip()
-                continue
+    def update_speed(self, dt):
+        self.elapsed += dt
+        self.speed_mult = self.speed_mult_at(self.elapsed)
+
+    def speed_mult_at(self, t):
+        # gradually ramp speed multiplier from 1.0 to max_speed_mult over speed_ramp_time seconds
+        k = min(t, self.speed_ramp_time) / max(1e-6, self.speed_ramp_time)
+        return 1.0 + (self.max_speed_mult - 1.0) * k
 
-            # spawn logic: interval reduces slightly as speed increases
+    def update_spawning(self, dt):
+        # spawn logic: interval reduces slightly as speed increases
+        t_start = self.frame * self.sim_dt
+        if self.random_spawns:
             interval = max(0.35, self.base_spawn_interval / (0.9 + 0.1 * self.speed_mult))
             self.spawn_timer += dt
-            if self.spawn_timer >= interval:
-                self.spawn_timer = 0.0
-                self.spawn_puck()
-
-            # update pucks
-            for p in list(self.pucks):
-                prev_y = p.y
-                p.update(dt)
-                # detect crossing of invisible line (line_y)
-                if (prev_y < self.line_y <= p.y) or (prev_y > self.line_y >= p.y):
-                    # determine which half the target belongs to
-                    mid = self.game_rect.w * 0.5
-                    target_side = "L" if p.tx < mid else "R"
-                    if self.goalie_side == target_side:
-                        # save
-                        p.fade = True
-                        p.alive = True
-                        self.score += 1
-                        self.play_save_sound()
-                    else:
-                        # miss => remove puck and decrement life (если не бесконечные жизни)
-                        p.alive = False
-                        if not (self.debug_mode and self.infinite_lives):
-                            self.lives -= 1
-                        self.play_miss_sound()
-                        # Показываем надпись ГОЛ
-                        self.show_goal_text = True
-                        self.goal_text_timer = 0.0
-                        
-                        if self.lives <= 0 and not (self.debug_mode and self.infinite_lives):
-                            # game over
-                            self.show_game_over = True
-                            self.stop_bg_music()
-                            break
-                if not p.alive:
-                    try: self.pucks.remove(p)
-                    except: pass
-
-            # draw frame
-            self.screen.fill((10, 18, 30))
-            # game area background
-            pygame.draw.rect(self.screen, (14,30,55), self.game_rect)
-            # draw bg image if available
-            if self.bg_surf:
-                bw = int(self.bg_surf.get_width() * self.bg_scale)
-                bh = int(self.bg_surf.get_height() * self.bg_scale)
-                try:
-                    bimg = pygame.transform.smoothscale(self.bg_surf, (bw, bh))
-                    self.screen.blit(bimg, (self.game_rect.x + int(self.bg_x), self.game_rect.y + int(self.bg_y)))
-                except Exception:
-                    pass
-            
-            # Отрисовка отладочных маркеров если включен режим отладки
-            if self.debug_mode:
-                self.draw_debug_markers()
-            
-            # draw pucks
-            for p in self.pucks:
-                p.draw(self.screen, self.game_rect.x, self.game_rect.y)
-            # draw goalie sprite
-            self.draw_goalie()
-            # HUD
+            if self.legacy_spawning:
+                # так считали записи до версии 4: остаток терялся, не больше одной шайбы за шаг
+                if self.spawn_timer >= interval:
+                    self.spawn_timer = 0.0
+                    self.spawn_puck()
+            else:
+                # остаток переносится, а после длинного шага догоняются все пропущенные спавны, каждый в свой момент
+                while self.spawn_timer >= interval:
+                    self.spawn_timer -= interval
+                    self.spawn_puck(t0=t_start + dt - self.spawn_timer)
+        # волны: события ленты, наступившие к концу шага
+        waves = self.waves
+        t_end = t_start + dt
+        while self.wave_pos < len(waves) and waves.t[self.wave_pos] < t_end:
+            k = self.wave_pos
+            self.wave_pos += 1
+            self.spawn_puck(waves.spawn[k], waves.target[k], waves.zone[k], max(t_start, waves.t[k]))
+
+    def update_pucks(self, dt):
+        # update pucks: разбираем только исходы, наступившие за этот шаг (по порядку)
+        pucks = self.pucks
+        inputs = self.take_step_inputs()
+        zone_now = self.goalie_zone
+        k = 0
+        t_start = self.frame * self.sim_dt
+        telemetry = self.telemetry if self.replay is None else None
+        pucks.begin_step()
+        for i, te in pucks.due(t_start + dt):
+            t = te - t_start  # момент внутри шага
+            # зона вратаря ровно в момент пересечения линии
+            while k < len(inputs) and inputs[k][0] <= t:
+                zone_now = inputs[k][1]
+                self.last_switch_time = t_start + inputs[k][0]
+                k += 1
+            saved = zone_now == pucks.zone[i]
+            if telemetry is not None:
+                telemetry.record(self.seed & 0xFFFFFFFF, self.frame, pucks.spawn[i], pucks.target[i], pucks.zone[i],
+                                 saved, pucks.mult[i], pucks.t0[i], te, self.last_switch_time)
+            if saved:
+                # save
+                pucks.settle(i)
+                self.score += 1
+                self.play_save_sound()
+            else:
+                # miss => remove puck and decrement life (если не бесконечные жизни)
+                pucks.remove(i)
+                self.miss_frames.append(self.frame)
+                if not (self.debug_mode and self.infinite_lives):
+                    self.lives -= 1
+                self.play_miss_sound()
+                # Показываем надпись ГОЛ
+                self.show_goal_text = True
+                self.goal_text_timer = 0.0
+
+                if self.lives <= 0 and not (self.debug_mode and self.infinite_lives):
+                    # game over
+                    self.show_game_over = True
+                    self.stop_bg_music()
+                    break
+        if inputs:
+            self.goalie_zone = inputs[-1][1]
+            self.last_switch_time = t_start + inputs[-1][0]
+        pucks.now = t_start + dt
+
+    def draw_frame(self):
+        """Кадр игры; возвращает изменённые области или None, если нужен полный flip"""
+        if self.gpu is not None:
+            return self.draw_frame_textures()
+        dirty = self.dirty_rects and not self.debug_mode and not self.full_redraw
+        static = self.get_static_layer()
+        if dirty:
+            # восстанавливаем фон только под тем, что рисовали в прошлом кадре
+            for r in self.prev_rects:
+                self.screen.blit(static, r, r)
+        else:
+            self.screen.blit(static, (0, 0))
+
+        # Отрисовка отладочных маркеров если включен режим отладки
+        if self.debug_mode:
+            self.draw_debug_markers()
+
+        # pucks, goalie sprite, HUD и надпись ГОЛ
+        rects = self.draw_pucks()
+        rects.append(self.draw_goalie())
+        rects.extend(self.render_hud())
+        goal_rect = self.draw_goal_text()
+        if goal_rect:
+            rects.append(goal_rect)
+
+        # Отрисовка координат курсора и профайлера в отладочном режиме
+        if self.debug_mode:
+            self.draw_cursor_coordinates()
+            self.draw_profiler_overlay()
+
+        prev = self.prev_rects
+        self.prev_rects = rects
+        self.full_redraw = False
+        return prev + rects if dirty else None
+
+    def draw_frame_textures(self):
+        """Кадр игры копиями текстур: фон, шайбы и вратари загружены заранее, HUD - отдельным слоем"""
+        gpu = self.gpu
+        gpu.clear()
+        gpu.layer("static", self.get_static_layer())
+        if self.debug_mode:
+            if self.debug_layer is None:
+                self.debug_layer = self.build_debug_layer()
+            layer, pos = self.debug_layer
+            gpu.layer("debug", layer, pos)
+        gr = self.game_rect
+        t = self.frame * self.sim_dt + (self.accumulator if self.interpolate else 0.0)
+        gpu.blits(self.pucks.blit_items(gr.x, gr.y, t, self.puck_radius))
+        x, y = self.zone_pos[self.goalie_zone]
+        img = self.zone_imgs[self.goalie_zone]
+        if img:
+            gpu.blit(img, (gr.x + x, gr.y + y))
+        else:
+            gpu.fill_rect((12, 60, 120), (gr.x + x - self.px(40), gr.y + y - self.px(40), self.px(80), self.px(80)))
+        gpu.layer("hud", *self.get_hud_layer())
+        gpu.frame_ready = True
+        return None
+
+    def get_hud_layer(self):
+        """HUD, надпись ГОЛ и отладочные оверлеи на прозрачном слое: (слой, позиция, изменился ли).
+        Перерисовывается, только когда меняется то, что на нём написано (в отладке - каждый кадр)."""
+        key = None if self.debug_mode else (self.score, self.lives, self.muted, self.show_goal_text)
+        if key is not None and key == self.hud_key:
+            return self.hud_layer, (0, 0), False
+        if self.hud_layer is None:
+            self.hud_layer = pygame.Surface((self.screen_w, self.screen_h), pygame.SRCALPHA)
+        self.hud_layer.fill((0, 0, 0, 0))
+        # существующие функции рисуют в self.screen - на время подменяем его слоем
+        screen, self.screen = self.screen, self.hud_layer
+        try:
             self.render_hud()
-            
-            # Отрисовка надписи ГОЛ если нужно
             self.draw_goal_text()
-            
-            # Отрисовка информации о разработчике
-            self.draw_developer_info()
-            
-            # Отрисовка координат курсора в отладочном режиме
             if self.debug_mode:
                 self.draw_cursor_coordinates()
+                self.draw_profiler_overlay()
+        finally:
+            self.screen = screen
+        self.hud_key = key
+        return self.hud_layer, (0, 0), True
 
+    def present(self, rects):
+        if self.gpu is not None:
+            # кадр игры уже собран из текстур; экраны меню нарисованы в холст - он загружается целиком
+            if not self.gpu.frame_ready:
+                self.gpu.clear()
+                self.gpu.layer("canvas", self.canvas, changed=True)
+            self.gpu.present()
+        elif self.canvas is not None:
+            # холст растягивается на весь экран одним проходом
+            pygame.transform.scale(self.canvas, self.display_size, self.display)
+            pygame.display.flip()
+        elif rects is None:
             pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+
+    def wait_frame_events(self):
+        """Ждём начала следующего кадра, собирая события с моментом их получения.
+
+        Вместо clock.tick события забираются сразу по приходу (event.wait с таймаутом),
+        поэтому у клика есть точное время, а не только номер кадра."""
+        deadline = self.last_frame_time + (1.0 / self.render_fps if self.render_fps else 0.0)
+        events = []
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            ev = pygame.event.wait(max(1, int(remaining * 1000)))
+            if ev.type != pygame.NOEVENT:
+                events.append((ev, time.perf_counter()))
+        now = time.perf_counter()
+        events.extend((ev, now) for ev in pygame.event.get())
+        dt = now - self.last_frame_time
+        self.last_frame_time = now
+        return self.take_stamped_events() + events, now, dt
+
+    def stamp_events(self):
+        """Забираем очередь событий между фазами кадра (симуляция, отрисовка, вывод).
+
+        Когда кадр дольше интервала render_fps (или render_fps = 0), ожидания перед кадром нет,
+        и без этого все события получили бы время начала следующего кадра. Так время события
+        ошибается не больше чем на длину одной фазы, а не всего кадра."""
+        now = time.perf_counter()
+        self.stamped_events.extend((ev, now) for ev in pygame.event.get())
+
+    def take_stamped_events(self):
+        events, self.stamped_events = self.stamped_events, []
+        return events
+
+    def poll_frame_events(self):
+        """События кадра без ожидания (для run_async): темп задаёт event loop"""
+        now = time.perf_counter()
+        events = self.take_stamped_events() + [(ev, now) for ev in pygame.event.get()]
+        dt = now - self.last_frame_time
+        self.last_frame_time = now
+        return events, now, dt
+
+    def run(self):
+        self.play_bg_music()
+        self.last_frame_time = time.perf_counter()
+        running = True
+        while running:
+            self.profiler.begin_frame()
+            running = self.tick(*self.wait_frame_events())
+        self.quit()
+
+    async def run_async(self):
+        """Тот же цикл, что run(), но без блокирующего ожидания: раз в кадр управление
+        отдаётся event loop (браузер/WASM, pygbag), темп кадров задаёт сам браузер"""
+        self.play_bg_music()
+        self.last_frame_time = time.perf_counter()
+        running = True
+        while running:
+            self.profiler.begin_frame()
+            running = self.tick(*self.poll_frame_events())
+            await asyncio.sleep(0)
+        self.quit()
 
+    def quit(self):
+        if self.scores is not None:
+            self.scores.close()
+        if self.telemetry is not None:
+            self.telemetry.close()
+        if self.gpu is not None:
+            self.gpu.close()
         pygame.quit()
 
-    def handle_mouse_click(self, pos):
-        """Обработка кликов мыши и касаний"""
-        mx, my = pos
+    def tick(self, events, now, dt):
+        """Один кадр: события, симуляция, отрисовка; False - пора выходить"""
+        prof = self.profiler
+        prof.mark("wait")
+        running = True
+        # опорная точка для перевода времени событий в время симуляции
+        sim_now = self.frame * self.sim_dt + self.accumulator + min(dt, MAX_FRAME_DT) * self.replay_speed
+        self.input_clock = (now, sim_now)
+        
+        # Обновляем таймер надписи ГОЛ
+        if self.show_goal_text:
+            self.goal_text_timer += dt
+            if self.goal_text_timer >= self.goal_text_duration:
+                self.show_goal_text = False
+                self.goal_text_timer = 0.0
+
+        for ev, t_ev in events:
+            if ev.type == pygame.QUIT:
+                running = False; break
+            elif ev.type == pygame.KEYDOWN:
+                if ev.key == pygame.K_ESCAPE:
+                    running = False; break
+                elif ev.key == pygame.K_m:
+                    self.toggle_mute()
+                elif ev.key == pygame.K_F1:  # Переключение отладочного режима
+                    self.debug_mode = not self.debug_mode
+                    self.profiler.enabled = self.debug_mode
+                    self.full_redraw = True
+                elif ev.key == pygame.K_F2:  # Переключение бесконечных жизней
+                    self.infinite_lives = not self.infinite_lives
+                elif ev.key == pygame.K_F3 and self.debug_mode:  # Сохранение трассы профайлера
+                    self.dump_trace()
+                elif ev.key in self.zone_keys:
+                    self.set_goalie_zone(self.zone_keys[ev.key], self.wall_to_sim(t_ev))
+            elif ev.type == pygame.VIDEORESIZE:
+                self.set_screen_size(ev.w, ev.h)
+            elif ev.type == pygame.MOUSEBUTTONDOWN:
+                self.handle_mouse_click(ev.pos, t_ev)
+            elif ev.type == pygame.FINGERDOWN:
+                # Обработка касаний для мобильных устройств
+                mx = ev.x * self.display_size[0]
+                my = ev.y * self.display_size[1]
+                self.handle_mouse_click((mx, my), t_ev)
+        self.poll_assets()
+        self.poll_config(dt)
+        prof.mark("events")
+
+        if self.show_start_screen or self.show_game_over:
+            if self.show_start_screen:
+                self.draw_start_screen()
+            else:
+                self.draw_game_over()
+            prof.mark("draw")
+            self.present(None)
+            prof.mark("flip")
+            self.stamp_events()
+            self.full_redraw = True
+        else:
+            # фиксированный шаг: кадр копит время, симуляция идёт ровно по sim_dt
+            self.accumulator += min(dt, MAX_FRAME_DT) * self.replay_speed
+            while self.accumulator >= self.sim_dt and not self.show_game_over:
+                self.step(self.sim_dt)
+                self.accumulator -= self.sim_dt
+                self.stamp_events()
+            if self.show_game_over:
+                self.on_game_over()
+            prof.mark("sim")
+
+            t_draw = time.perf_counter()
+            rects = self.draw_frame()
+            prof.mark("draw")
+            self.stamp_events()
+            self.present(rects)
+            prof.mark("flip")
+            self.stamp_events()
+            cost = time.perf_counter() - t_draw
+            self.render_cost = cost if self.render_cost is None else self.render_cost * 0.95 + cost * 0.05
+        # фоновые ассеты без потоков догружаются по одному, уже после показанного кадра
+        if self.loader is not None:
+            self.loader.step()
+        if self.telemetry is not None:
+            self.telemetry.maybe_flush()
+        prof.end_frame()
+        return running
+
+    def handle_mouse_click(self, pos, t=None):
+        """Обработка кликов мыши и касаний (pos - в координатах экрана, t - момент события по time.perf_counter)"""
+        mx, my = self.to_canvas(pos)
         
         if self.show_start_screen:
-            if self.is_point_in_start_button(mx, my):
+            if not self.critical_assets_ready():
+                # пока грузятся картинки сцены, работает только кнопка подписки
+                if self.subscribe_button_rect.collidepoint(mx, my):
+                    self.open_vk_community()
+            elif self.is_point_in_start_button(mx, my):
                 self.start_game()
             elif self.subscribe_button_rect.collidepoint(mx, my):
                 self.open_vk_community()
@@ -617,20 +2254,12 @@ class Game:
             elif self.subscribe_button_rect.collidepoint(mx, my):
                 self.open_vk_community()
             else:
-                # gameplay click toggles goalie side (as requested)
-                self.handle_click_toggle_goalie()
+                # gameplay click moves the goalie (две зоны - просто переключение)
+                self.handle_click_goalie((mx, my), None if t is None else self.wall_to_sim(t))
 
     # ---------- UI screens ----------
     def draw_start_screen(self):
-        self.screen.fill((10,18,30))
-        pygame.draw.rect(self.screen, (14,30,55), self.game_rect)
-        if self.bg_surf:
-            bw = int(self.bg_surf.get_width() * self.bg_scale)
-            bh = int(self.bg_surf.get_height() * self.bg_scale)
-            try:
-                bimg = pygame.transform.smoothscale(self.bg_surf, (bw, bh))
-                self.screen.blit(bimg, (self.game_rect.x + int(self.bg_x), self.game_rect.y + int(self.bg_y)))
-            except: pass
+        self.screen.blit(self.get_static_layer(), (0, 0))
             
         # Отрисовка отладочных маркеров на стартовом экране
         if self.debug_mode:
@@ -642,59 +2271,106 @@ class Game:
             
         # big Start button centered inside game_rect (поднята выше)
         btn_w = int(self.game_rect.w * 0.28)
-        btn_h = 64
+        btn_h = self.px(64)
         bx = self.game_rect.x + (self.game_rect.w - btn_w)//2.12
         by = self.game_rect.y + (self.game_rect.h - btn_h)//3
-        pygame.draw.rect(self.screen, (255,200,50), (bx, by, btn_w, btn_h), border_radius=10)
-        txt = self.font.render("Начать", True, (10,10,10))
+        if self.critical_assets_ready():
+            pygame.draw.rect(self.screen, (255,200,50), (bx, by, btn_w, btn_h), border_radius=10)
+            label = "Начать"
+        else:
+            # прогресс фоновой загрузки прямо в кнопке
+            progress = self.loader.progress if self.loader else 1.0
+            pygame.draw.rect(self.screen, (120,100,40), (bx, by, btn_w, btn_h), border_radius=10)
+            pygame.draw.rect(self.screen, (255,200,50), (bx, by, int(btn_w * progress), btn_h), border_radius=10)
+            label = f"Загрузка... {int(progress * 100)}%"
+        txt = self.text_cache.render(self.font, label, (10,10,10))
         self.screen.blit(txt, (bx + (btn_w - txt.get_width())//2, by + (btn_h - txt.get_height())//2))
         
         # hint
         hint_text = "Клик/тап по экрану — переключить вратаря" if self.is_mobile else "Клик/тап по экрану — переключить вратаря во время игры"
-        hint = self.small.render(hint_text, True, (200,200,200))
-        self.screen.blit(hint, (self.game_rect.x + 18, self.game_rect.y + self.game_rect.h - 28))
+        if len(self.zone_pos) > 2:
+            hint_text = "Клик/тап — вратарь в ближайшую зону"
+        hint = self.text_cache.render(self.small, hint_text, (200,200,200))
+        self.screen.blit(hint, (self.game_rect.x + self.px(18), self.game_rect.y + self.game_rect.h - self.px(28)))
         
         # Отладочная подсказка
         if self.debug_mode:
-            debug_hint = self.small.render("DEBUG: F1 - отладка, F2 - беск. жизни, Координаты под курсором", True, (255, 100, 100))
-            self.screen.blit(debug_hint, (self.game_rect.x + 18, self.game_rect.y + self.game_rect.h - 50))
-        
-        # Информация о разработчике на стартовом экране
-        self.draw_developer_info()
+            debug_hint = self.text_cache.render(self.small, "DEBUG: F1 - отладка, F2 - беск. жизни, Координаты под курсором", (255, 100, 100))
+            self.screen.blit(debug_hint, (self.game_rect.x + self.px(18), self.game_rect.y + self.game_rect.h - self.px(50)))
 
     def is_point_in_start_button(self, mx, my):
         btn_w = int(self.game_rect.w * 0.28)
-        btn_h = 64
+        btn_h = self.px(64)
         bx = self.game_rect.x + (self.game_rect.w - btn_w)//2.12
         by = self.game_rect.y + (self.game_rect.h - btn_h)//3
         return bx <= mx <= bx+btn_w and by <= my <= by+btn_h
 
-    def start_game(self):
-        self.reset_game_state()
+    def start_game(self, seed=None, replay=None):
+        self.replay = replay
+        # до версии 4 таймер спавна сбрасывался в ноль - старые записи повторяются со старым таймером
+        self.legacy_spawning = replay is not None and replay.version < 4
+        if replay is not None:
+            seed = replay.seed
+            self.sim_dt = replay.dt
+            # координаты шайб зависят от размера поля - берём его из записи
+            if replay.field:
+                self.set_field_size(*replay.field)
+            self.speed_scale = replay.speed_scale
+        else:
+            self.sim_dt = SIM_DT
+            self.replay_speed = 1.0
+            if self.auto_render_scale:
+                self.adjust_render_scale()
+            # поле уменьшено вместе с холстом - скорости шайб тоже, чтобы на экране игра не менялась
+            self.speed_scale = self.render_scale
+            # после повтора с чужим размером поля возвращаем своё
+            rect = self.game_rect
+            self.compute_game_rect()
+            if self.game_rect != rect:
+                self.load_scene_from_config()
+        self.reset_game_state(seed)
+        if replay is not None:
+            self.pending_inputs.extend(replay.inputs)
         self.show_start_screen = False
         self.show_game_over = False
         self.play_bg_music()
 
+    def on_game_over(self):
+        """Партия закончилась: запись и рекорд (повторы не учитываются)"""
+        if self.replay is not None:
+            return
+        if self.record_path:
+            save_recording(self.record_path, self.make_recording())
+        if self.scores is not None:
+            prev = self.scores.add(self.score, self.elapsed, self.seed)
+            # пока база не прочитана (или не открылась), о рекорде не объявляем
+            self.new_record = prev is not None and self.score > prev
+        if self.telemetry is not None:
+            self.telemetry.flush()
+
     def draw_game_over(self):
         # overlay game over
         self.screen.fill((0,0,0))
-        txt = self.font.render("Игра окончена", True, (255,255,255))
-        sc = self.font.render(f"Ваш рекорд: {self.score}", True, (255,255,255))
-        self.screen.blit(txt, (self.screen_w//2 - txt.get_width()//2, self.screen_h//2 - 60))
-        self.screen.blit(sc, (self.screen_w//2 - sc.get_width()//2, self.screen_h//2 - 20))
+        txt = self.text_cache.render(self.font, "Игра окончена", (255,255,255))
+        label = f"Счёт: {self.score}"
+        if self.scores is not None and self.scores.ready:
+            label += f"   Ваш рекорд: {max(self.scores.best, self.score)}"
+        sc = self.text_cache.render(self.font, label, (255,215,80) if self.new_record else (255,255,255))
+        self.screen.blit(txt, (self.screen_w//2 - txt.get_width()//2, self.screen_h//2 - self.px(60)))
+        self.screen.blit(sc, (self.screen_w//2 - sc.get_width()//2, self.screen_h//2 - self.px(20)))
         # restart button
-        btn_w = 240; btn_h = 56
-        bx = self.screen_w//2 - btn_w//2; by = self.screen_h//2 + 36
+        btn_w = self.px(240); btn_h = self.px(56)
+        bx = self.screen_w//2 - btn_w//2; by = self.screen_h//2 + self.px(36)
         pygame.draw.rect(self.screen, (255,200,50), (bx, by, btn_w, btn_h), border_radius=10)
-        txt2 = self.font.render("Играть снова", True, (0,0,0))
+        txt2 = self.text_cache.render(self.font, "Играть снова", (0,0,0))
         self.screen.blit(txt2, (bx + (btn_w - txt2.get_width())//2, by + (btn_h - txt2.get_height())//2))
         
         # Информация о разработчике на экране окончания игры
         self.draw_developer_info()
 
     def is_point_in_restart_button(self, mx, my):
-        btn_w = 240; btn_h = 56
-        bx = self.screen_w//2 - btn_w//2; by = self.screen_h//2 + 36
+        btn_w = self.px(240); btn_h = self.px(56)
+        bx = self.screen_w//2 - btn_w//2; by = self.screen_h//2 + self.px(36)
         return bx <= mx <= bx+btn_w and by <= my <= by+btn_h
 
     def toggle_mute(self):
@@ -703,14 +2379,192 @@ class Game:
             pygame.mixer.pause()
         else:
             pygame.mixer.unpause()
-            if self.snd_game and not self.show_start_screen and not self.show_game_over:
-                self.snd_game.play(loops=-1, fade_ms=1000)
+            if self.snd_game and not self.show_start_screen and not self.show_game_over and not self.audio.music_playing():
+                self.audio.play_music(self.snd_game)
+
+# ---------- Headless simulation ----------
+class ScriptedPolicy:
+    """Заранее заданные переключения вратаря: [(время, номер или имя зоны), ...]"""
+    def __init__(self, script):
+        self.script = sorted(script, key=lambda e: e[0])
+        self.pos = 0
+
+    def __call__(self, game, dt):
+        zone = None
+        while self.pos < len(self.script) and self.script[self.pos][0] <= game.elapsed:
+            zone = game.zone_index(self.script[self.pos][1])
+            self.pos += 1
+        return zone
+
+class PerfectPolicy:
+    """Идеальная реакция: встаёт в зону шайбы с ближайшим исходом (вершина кучи)"""
+    def __call__(self, game, dt):
+        i = game.pucks.next_outcome()
+        if i is None:
+            return None
+        return game.pucks.zone[i]
+
+class RandomPolicy:
+    """Случайные переключения в среднем rate раз в секунду"""
+    def __init__(self, rate=2.0, rng=None):
+        self.rate = rate
+        self.rng = rng or random.Random()
+
+    def __call__(self, game, dt):
+        if self.rng.random() < self.rate * dt:
+            return self.rng.randrange(len(game.zone_pos))
+        return None
+
+class ReactionPolicy:
+    """Идеальная стратегия с задержкой: шайба замечается только через delay секунд после спавна"""
+    def __init__(self, delay=0.25):
+        self.delay = delay
+
+    def __call__(self, game, dt):
+        pucks = game.pucks
+        i = pucks.next_outcome()
+        if i is None or game.frame * game.sim_dt - pucks.t0[i] < self.delay:
+            return None
+        return pucks.zone[i]
+
+class Replay:
+    """Запись партии для повтора: смены зоны применяются на тех же шагах и в те же моменты"""
+    def __init__(self, rec):
+        self.seed = rec["seed"]
+        self.dt = rec.get("dt", SIM_DT)
+        self.field = rec.get("field")
+        self.speed_scale = rec.get("speed_scale", 1.0)
+        self.version = rec.get("version", 1)
+        # версия 1 писала [шаг, сторона] без смещения внутри шага, версии 1-2 - сторону "L"/"R" вместо номера зоны
+        self.inputs = [(e[0], e[2] if len(e) > 2 else 0.0, "LR".index(e[1]) if isinstance(e[1], str) else e[1])
+                       for e in rec.get("inputs", [])]
+
+def simulate_session(game, policy, dt=SIM_DT, max_time=600.0, seed=None):
+    """Одна партия с фиксированным dt без отрисовки; возвращает (счёт, время, кадры)"""
+    game.start_game(seed)
+    game.sim_dt = dt
+    while not game.show_game_over and game.elapsed < max_time:
+        zone = policy(game, dt)
+        if zone is not None:  # зона 0 - тоже смена
+            game.set_goalie_zone(zone)
+        game.step(dt)
+    return game.score, game.elapsed, game.frame
+
+def replay_session(game, rec, max_time=float("inf")):
+    """Быстрый повтор записи без отрисовки"""
+    game.start_game(replay=Replay(rec))
+    while not game.show_game_over and game.elapsed < max_time:
+        game.step(game.sim_dt)
+    return game.score, game.miss_frames
+
+POLICIES = ("perfect", "reaction", "random", "scripted")
+
+def make_policy(name, seed=None, script=None, reaction=0.25):
+    if name == "perfect":
+        return PerfectPolicy()
+    if name == "reaction":
+        return ReactionPolicy(reaction)
+    if name == "random":
+        return RandomPolicy(rng=random.Random(seed))
+    if name == "scripted":
+        return ScriptedPolicy(script or [])
+    raise ValueError(f"Неизвестная стратегия: {name}")
+
+def run_simulation(args):
+    import statistics
+    script = None
+    if args.script:
+        script = [tuple(e) for e in load_json(args.script) or []]
+    game = Game(headless=True)
+    dt = 1.0 / args.fps
+    scores = []; survived = []; total_frames = 0
+    t0 = time.perf_counter()
+    for n in range(args.simulate):
+        seed = None if args.seed is None else args.seed + n
+        policy = make_policy(args.policy, seed, script, args.reaction)
+        score, elapsed, frames = simulate_session(game, policy, dt, args.max_time, seed)
+        scores.append(score); survived.append(elapsed); total_frames += frames
+    wall = time.perf_counter() - t0
+    pygame.quit()
+
+    print(f"Партий: {len(scores)}, стратегия: {args.policy}, dt: {dt:.5f}")
+    print(f"Кадров: {total_frames} за {wall:.2f} с ({total_frames / max(wall, 1e-9):.0f} кадров/с)")
+    print(f"Счёт: среднее {statistics.mean(scores):.1f}, медиана {statistics.median(scores)}, "
+          f"мин {min(scores)}, макс {max(scores)}")
+    print(f"Время жизни: среднее {statistics.mean(survived):.1f} с, макс {max(survived):.1f} с")
+
+def render_scale_arg(v):
+    """Значение --render-scale: доля разрешения экрана (0.25..1) или auto"""
+    if v == "auto":
+        return v
+    scale = float(v)
+    if not 0.25 <= scale <= 1.0:
+        raise ValueError(v)
+    return scale
+
+def run_replay(args):
+    rec = load_json(args.replay)
+    if not rec:
+        print(f"Не удалось прочитать запись: {args.replay}")
+        sys.exit(1)
+    if args.headless:
+        game = Game(headless=True)
+        t0 = time.perf_counter()
+        score, miss_frames = replay_session(game, rec)
+        wall = time.perf_counter() - t0
+        pygame.quit()
+        same = score == rec.get("score") and miss_frames == rec.get("miss_frames")
+        print(f"Счёт: {score}, пропуски на шагах: {miss_frames}")
+        print(f"Шагов: {game.frame} за {wall:.3f} с, совпадает с записью: {'да' if same else 'нет'}")
+        return
+    game = Game(audio_buffer=args.audio_buffer, render_fps=args.render_fps, vsync=args.vsync,
+                render_scale=args.render_scale, renderer=args.renderer)
+    game.dirty_rects = args.dirty_rects
+    game.wait_for_assets()
+    game.start_game(replay=Replay(rec))
+    game.replay_speed = args.speed
+    game.run()
 
 # ---------- Run ----------
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Goalie Clicker")
+    parser.add_argument("--simulate", type=int, metavar="N", help="прогнать N партий без окна и звука")
+    parser.add_argument("--policy", choices=POLICIES, default="perfect")
+    parser.add_argument("--reaction", type=float, default=0.25, help="задержка реакции для --policy reaction, с")
+    parser.add_argument("--script", help="JSON со списком [время, зона] для --policy scripted")
+    parser.add_argument("--fps", type=float, default=FPS, help="частота шага симуляции (dt = 1/fps)")
+    parser.add_argument("--max-time", type=float, default=600.0, help="ограничение длины партии, с")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--record", metavar="PATH", help="сохранять запись каждой законченной партии")
+    parser.add_argument("--replay", metavar="PATH", help="воспроизвести запись партии")
+    parser.add_argument("--speed", type=float, default=1.0, help="скорость повтора относительно реального времени")
+    parser.add_argument("--headless", action="store_true", help="повтор без окна, с максимальной скоростью")
+    parser.add_argument("--dirty-rects", action="store_true", help="обновлять только изменившиеся области экрана")
+    parser.add_argument("--render-fps", type=int, default=FPS, help="частота отрисовки, 0 - без ограничения")
+    parser.add_argument("--vsync", action="store_true", help="отрисовка по вертикальной синхронизации")
+    parser.add_argument("--render-scale", type=render_scale_arg, default=1.0,
+                        help="внутреннее разрешение: 0.5, 0.75, 1.0 или auto (по времени отрисовки)")
+    parser.add_argument("--renderer", choices=RENDERERS, default="surface",
+                        help="вывод: surface - поверхности, gpu - текстуры на видеокарте, software - текстуры в программном рендерере SDL")
+    parser.add_argument("--no-telemetry", action="store_true", help="не писать телеметрию исходов шайб")
+    parser.add_argument("--audio-buffer", type=int, default=AUDIO_BUFFER, help="буфер микшера в сэмплах (задержка звука)")
+    args = parser.parse_args()
+
     # ensure assets folder exists
     if not os.path.isdir(ASSETS_DIR):
         print("Создайте папку 'assets' и положите туда level_config.json и спрайты keepL.png/keepR.png")
         sys.exit(1)
-    game = Game()
+    if args.simulate:
+        run_simulation(args)
+        sys.exit(0)
+    if args.replay:
+        run_replay(args)
+        sys.exit(0)
+    game = Game(audio_buffer=args.audio_buffer, render_fps=args.render_fps, vsync=args.vsync,
+                render_scale=args.render_scale, renderer=args.renderer)
+    game.record_path = args.record
+    if args.no_telemetry:
+        game.telemetry = None
+    game.dirty_rects = args.dirty_rects
     game.run()
\ No newline at end of file
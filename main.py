@@ -0,0 +1,11 @@
+# main.py — точка входа веб-версии Goalie Clicker (pygbag)
+# Сборка: python build_web.py && python -m pygbag build/web
+# В браузере нельзя блокировать поток, поэтому используется асинхронный цикл Game.run_async.
+
+import asyncio
+import game
+
+async def main():
+    await game.Game().run_async()
+
+asyncio.run(main())
@@ -0,0 +1,180 @@
+# sweep.py — перебор параметров сложности Goalie Clicker
+# Запуск: python sweep.py --max-speed-mult 6 8 10 --ramp-time 90 120 --spawn-interval 0.7 0.9 \
+#         --speed-band 260:360 300:420 --seeds 100 [--workers 8] [--out sweep_results.gcs]
+# Каждая комбинация прогоняется на одних и тех же seed без окна и звука, партии раздаются
+# по процессам. Результат - колоночный файл (читается load_sweep).
+
+import os, json, time, struct, itertools, statistics
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # иначе приветствие печатает каждый процесс
+
+import game
+
+SWEEP_MAGIC = b"GCSWEEP1"
+ALIGN = 16
+PARAMS = ("max_speed_mult", "speed_ramp_time", "base_spawn_interval", "speed_lo", "speed_hi")
+
+# ---------- Worker ----------
+_game = None
+
+def run_task(task):
+    """Партии одной комбинации на одном seed: (счёт, время жизни, скорость первого промаха идеального бота)"""
+    global _game
+    if _game is None:
+        _game = game.Game(headless=True)  # один headless-экземпляр на процесс
+    params, seed, policy, reaction, max_time = task
+    g = _game
+    g.max_speed_mult, g.speed_ramp_time, g.base_spawn_interval, lo, hi = params
+    g.puck_speed = (lo, hi)
+    score, survived, _ = game.simulate_session(g, game.make_policy(policy, seed, reaction=reaction), max_time=max_time, seed=seed)
+    if policy == "perfect":
+        first_miss = g.miss_frames[0] if g.miss_frames else None
+    else:
+        game.simulate_session(g, game.PerfectPolicy(), max_time=max_time, seed=seed)
+        first_miss = g.miss_frames[0] if g.miss_frames else None
+    # speed_mult на шаге промаха (update_speed вызывается до разбора исходов)
+    miss_speed = g.speed_mult_at((first_miss + 1) * g.sim_dt) if first_miss is not None else float("nan")
+    return score, survived, miss_speed
+
+# ---------- Aggregation ----------
+def percentile(sorted_values, q):
+    k = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+def aggregate(runs, max_time):
+    scores = sorted(r[0] for r in runs)
+    survived = sorted(r[1] for r in runs)
+    misses = sorted(r[2] for r in runs if r[2] == r[2])  # без nan
+    return {
+        "runs": len(runs),
+        "survival_mean": statistics.mean(survived),
+        "survival_p10": percentile(survived, 0.10),
+        "survival_p50": percentile(survived, 0.50),
+        "survival_p90": percentile(survived, 0.90),
+        "alive_at_end": sum(1 for s in survived if s >= max_time) / len(survived),
+        "score_mean": statistics.mean(scores),
+        "score_std": statistics.pstdev(scores),
+        "score_p10": percentile(scores, 0.10),
+        "score_p50": percentile(scores, 0.50),
+        "score_p90": percentile(scores, 0.90),
+        "score_max": scores[-1],
+        "perfect_miss_rate": len(misses) / len(runs),
+        "perfect_miss_speed_p50": percentile(misses, 0.50) if misses else float("nan"),
+        "perfect_miss_speed_min": misses[0] if misses else float("nan"),
+    }
+
+# ---------- Columnar file ----------
+def align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+def write_columns(path, tables, meta):
+    """tables: {таблица: {колонка: array}}; формат как у пака: магия, <I длина индекса, JSON-индекс, выровненные колонки"""
+    blobs = []
+    index = {"meta": meta, "tables": {}}
+    for table, columns in tables.items():
+        index["tables"][table] = {name: {"type": col.typecode, "n": len(col)} for name, col in columns.items()}
+        blobs.extend((table, name, col.tobytes()) for name, col in columns.items())
+    index_len = 0
+    while True:
+        offset = align(len(SWEEP_MAGIC) + 4 + index_len)
+        for table, name, raw in blobs:
+            index["tables"][table][name]["offset"] = offset
+            offset = align(offset + len(raw))
+        data = json.dumps(index, ensure_ascii=False).encode("utf-8")
+        if len(data) == index_len:
+            break
+        index_len = len(data)
+    with open(path, "wb") as f:
+        f.write(SWEEP_MAGIC)
+        f.write(struct.pack("<I", len(data)))
+        f.write(data)
+        for table, name, raw in blobs:
+            f.seek(index["tables"][table][name]["offset"])
+            f.write(raw)
+        f.truncate(offset)
+    return offset
+
+def load_sweep(path):
+    """Чтение файла sweep: (meta, {таблица: {колонка: array}})"""
+    with open(path, "rb") as f:
+        blob = f.read()
+    if blob[:len(SWEEP_MAGIC)] != SWEEP_MAGIC:
+        raise ValueError(f"{path}: не файл sweep")
+    (index_len,) = struct.unpack_from("<I", blob, len(SWEEP_MAGIC))
+    start = len(SWEEP_MAGIC) + 4
+    index = json.loads(blob[start:start + index_len].decode("utf-8"))
+    tables = {}
+    for table, columns in index["tables"].items():
+        tables[table] = {}
+        for name, c in columns.items():
+            col = array(c["type"])
+            col.frombytes(blob[c["offset"]:c["offset"] + c["n"] * col.itemsize])
+            tables[table][name] = col
+    return index["meta"], tables
+
+# ---------- Main ----------
+def speed_band(v):
+    lo, hi = v.split(":")
+    return float(lo), float(hi)
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Перебор параметров сложности на пуле процессов")
+    parser.add_argument("--max-speed-mult", type=float, nargs="+", default=[game.MAX_SPEED_MULT])
+    parser.add_argument("--ramp-time", type=float, nargs="+", default=[game.SPEED_RAMP_TIME], help="SPEED_RAMP_TIME, с")
+    parser.add_argument("--spawn-interval", type=float, nargs="+", default=[game.BASE_SPAWN_INTERVAL], help="base_spawn_interval, с")
+    parser.add_argument("--speed-band", type=speed_band, nargs="+", default=[game.PUCK_SPEED], metavar="LO:HI",
+                        help="разброс базовой скорости шайбы, пикс/с")
+    parser.add_argument("--seeds", type=int, default=50, help="партий (seed 0..N-1) на комбинацию")
+    parser.add_argument("--policy", choices=("perfect", "reaction", "random"), default="reaction",
+                        help="чья выживаемость и счёт собираются (промах идеального бота считается всегда)")
+    parser.add_argument("--reaction", type=float, default=0.25, help="задержка реакции для --policy reaction, с")
+    parser.add_argument("--max-time", type=float, default=600.0, help="ограничение длины партии, с")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="процессов в пуле")
+    parser.add_argument("--out", default="sweep_results.gcs")
+    args = parser.parse_args()
+
+    combos = list(itertools.product(args.max_speed_mult, args.ramp_time, args.spawn_interval, args.speed_band))
+    combos = [(m, r, i, lo, hi) for m, r, i, (lo, hi) in combos]
+    tasks = [(c, seed, args.policy, args.reaction, args.max_time) for c in combos for seed in range(args.seeds)]
+    print(f"Комбинаций: {len(combos)}, партий: {len(tasks)}, процессов: {args.workers}")
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(run_task, tasks, chunksize=max(1, len(tasks) // (args.workers * 8))))
+    wall = time.perf_counter() - t0
+
+    # таблица партий: по строке на (комбинация, seed)
+    runs = {"combo": array("I"), "seed": array("I"), "score": array("I"),
+            "survival": array("d"), "perfect_miss_speed": array("d")}
+    per_combo = {}
+    for k, ((c, seed, *_), (score, survived, miss_speed)) in enumerate(zip(tasks, results)):
+        ci = k // args.seeds  # задачи идут по комбинациям, внутри - по seed
+        runs["combo"].append(ci); runs["seed"].append(seed); runs["score"].append(score)
+        runs["survival"].append(survived); runs["perfect_miss_speed"].append(miss_speed)
+        per_combo.setdefault(ci, []).append((score, survived, miss_speed))
+
+    # таблица комбинаций: параметры + агрегаты
+    summary = {name: array("d") for name in PARAMS}
+    for ci, c in enumerate(combos):
+        for name, v in zip(PARAMS, c):
+            summary[name].append(v)
+        for name, v in aggregate(per_combo[ci], args.max_time).items():
+            summary.setdefault(name, array("d")).append(v)
+        s = {name: col[-1] for name, col in summary.items()}
+        print(f"x{c[0]:g} рампа {c[1]:g} с, спавн {c[2]:g} с, {c[3]:g}-{c[4]:g} пикс/с | "
+              f"жизнь p50 {s['survival_p50']:.1f} с, счёт p50 {s['score_p50']:.0f} (p10 {s['score_p10']:.0f}, p90 {s['score_p90']:.0f}), "
+              + (f"идеальный бот промахивается на x{s['perfect_miss_speed_p50']:.2f} ({s['perfect_miss_rate'] * 100:.0f}%)"
+                 if s["perfect_miss_rate"] else "идеальный бот не промахивается"))
+
+    meta = {"policy": args.policy, "reaction": args.reaction, "max_time": args.max_time, "seeds": args.seeds,
+            "sim_dt": game.SIM_DT, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    size = write_columns(args.out, {"combos": summary, "runs": runs}, meta)
+    print(f"{len(tasks)} партий за {wall:.1f} с; результаты: {args.out} ({size / 1024:.0f} КБ)")
+
+if __name__ == "__main__":
+    main()